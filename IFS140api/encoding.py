@@ -0,0 +1,126 @@
+"""Fast-path responses for the listing endpoints.
+
+The listings are built straight into bytes instead of going through FastAPI's
+jsonable_encoder, using orjson when it is installed. Clients can ask for a
+smaller layout with the Accept header:
+
+    application/json                          {"status", "<key>": [[...row...], ...]}  (default)
+    application/vnd.clockedin.columnar+json   {"status", "columns": [...], "values": [[...column...], ...]}
+    application/msgpack                       the columnar layout as MessagePack (needs msgpack)
+
+The representation and the content coding with the highest q-value win.
+Bodies over IFS_COMPRESS_MIN_SIZE bytes are brotli (if installed) or gzip
+compressed when the client's Accept-Encoding allows it.
+"""
+import gzip
+import json
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from IFS140backend.IFSmetrics import JSON_ENCODE
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COLUMNAR_JSON = "application/vnd.clockedin.columnar+json"
+MSGPACK = "application/msgpack"
+
+COMPRESS_MIN_SIZE = int(os.environ.get("IFS_COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(content) -> bytes:
+    with JSON_ENCODE.time():
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# Accept / Accept-Encoding header -> {token: q}; a malformed q counts as 0
+def _qvalues(header: str) -> Dict[str, float]:
+    found: Dict[str, float] = {}
+    for part in header.lower().split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = min(1.0, max(0.0, float(value.strip())))
+                except ValueError:
+                    q = 0.0
+        found[fields[0]] = max(q, found.get(fields[0], 0.0))
+    return found
+
+
+# Pick the offer with the highest q. offers are (token, wildcards that also match it)
+# in the server's order of preference, which breaks ties. Returns None if none is acceptable.
+def _negotiate(qvalues: Dict[str, float], offers: Sequence[Tuple[str, Tuple[str, ...]]]) -> Optional[str]:
+    best, best_q = None, 0.0
+    for token, wildcards in offers:
+        if token in qvalues:
+            q = qvalues[token]
+        else:
+            q = max((qvalues[w] for w in wildcards if w in qvalues), default=0.0)
+        if q > best_q:
+            best, best_q = token, q
+    return best
+
+
+def _columnar(columns: Sequence[str], rows: Sequence[Sequence]) -> dict:
+    values = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+    return {"status": "success", "columns": list(columns), "values": values}
+
+
+def listing_response(request: Request, key: str, columns: Sequence[str], rows: Sequence[Sequence]) -> Response:
+    # The compact layouts are only sent when asked for by name, so */* (and an
+    # empty Accept) still get the plain JSON the GUI and browsers expect
+    offers = []
+    if msgpack is not None:
+        offers += [(MSGPACK, ()), ("application/x-msgpack", ())]
+    offers += [(COLUMNAR_JSON, ()), ("application/json", ("application/*", "*/*"))]
+    accept = request.headers.get("accept", "")
+    chosen = _negotiate(_qvalues(accept), offers) if accept else None
+
+    if chosen in (MSGPACK, "application/x-msgpack"):
+        with JSON_ENCODE.time():
+            body = msgpack.packb(_columnar(columns, rows), use_bin_type=True)
+        media_type = MSGPACK
+    elif chosen == COLUMNAR_JSON:
+        body = dumps(_columnar(columns, rows))
+        media_type = COLUMNAR_JSON
+    else:
+        body = dumps({"status": "success", key: rows})
+        media_type = "application/json"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= COMPRESS_MIN_SIZE:
+        codings = [("br", ("*",))] if brotli is not None else []
+        codings += [("gzip", ("*",)), ("identity", ())]
+        coding = _negotiate(_qvalues(request.headers.get("accept-encoding", "")), codings)
+        if coding == "br":
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif coding == "gzip":
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -1,10 +1,34 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from IFS140backend.IFSdb import setup_database
+from IFS140backend.IFSdb import get_tenants, setup_database_once, tenancy_enabled
 from IFS140backend import IFSservices as services
+from IFS140backend.IFSmetrics import render_metrics, start_snapshot_writer
+from IFS140api.middleware import MetricsMiddleware, TenantMiddleware, TimedJSONResponse
+from IFS140api import profiling, ratelimit
+from IFS140api.encoding import listing_response
+from IFS140backend.IFSstorage import MY_REQUEST_COLUMNS, ALL_REQUEST_COLUMNS, STAFF_COLUMNS
 
-app = FastAPI(title="IFS140 Leave Management API")
+app = FastAPI(title="IFS140 Leave Management API", default_response_class=TimedJSONResponse)
+
+# One process can serve many companies, each with its own SQLite file (see IFS140backend/IFStenants.py)
+if tenancy_enabled():
+    app.add_middleware(TenantMiddleware)
+
+# Per-request profiling is only wired in when IFS_PROFILE_TOKEN is set, so
+# normal deployments don't pay for the extra middleware and endpoint wrapper
+if profiling.enabled():
+    app.router.route_class = profiling.ProfiledRoute
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Added last so it is the outermost layer and also counts the responses the
+# middlewares above answer themselves (missing or unknown tenant)
+app.add_middleware(MetricsMiddleware)
+
+# Per-worker lifecycle flags. Each worker process has its own copy, anything that
+# has to be shared between workers belongs in the database instead.
+worker_state = {"ready": False, "draining": False}
 
 # Models for our responses and requests
 class LoginRequest(BaseModel):
@@ -39,14 +63,66 @@ class EmployeeOut(EmployeeBase):
 # API Startup
 @app.on_event("startup")
 def startup_event():
-    setup_database()
+    if tenancy_enabled():
+        get_tenants()  # fails the start-up, not every request, if the backend can't do tenants
+    setup_database_once()
+    start_snapshot_writer()
+    worker_state["ready"] = True
+
+# Called by the launcher's DrainingServer as soon as a shutdown signal arrives,
+# while the listener is still open and /readyz can still be scraped
+def start_draining():
+    worker_state["draining"] = True
+
+# Health checks
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    if not worker_state["ready"] or worker_state["draining"]:
+        return JSONResponse(status_code=503, content={"status": "unavailable", **worker_state})
+    return {"status": "ready"}
+
+# Prometheus scrape endpoint; summed over all workers when IFS_METRICS_DIR is set
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Captured request profiles (see IFS140api/profiling.py)
+def require_profile_token(token: Optional[str]):
+    if not profiling.check_token(token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/admin/profiles")
+def api_list_profiles(x_profile_token: Optional[str] = Header(None)):
+    require_profile_token(x_profile_token)
+    return {"status": "success", "profiles": profiling.list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}")
+def api_get_profile(profile_id: str, format: str = "text", x_profile_token: Optional[str] = Header(None)):
+    require_profile_token(x_profile_token)
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    try:
+        body, media_type = profile.render(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type=media_type)
 
 # Authentication
 @app.post("/login")
-def login(data: LoginRequest):
+def login(data: LoginRequest, request: Request):
+    # throttle before the password hash is ever computed
+    ip = ratelimit.client_ip(request)
+    charged = ratelimit.check_login(ip, data.emp_id)
     user = services.authenticate_user(data.emp_id, data.password)
     if not user:
+        ratelimit.login_failed(ip, data.emp_id)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    ratelimit.login_succeeded(ip, data.emp_id, charged)
     name, role = user
     return {"status": "success", "emp_id": data.emp_id, "name": name, "role": role, "leave_available": services.get_leave_balance(data.emp_id)}
 
@@ -58,14 +134,15 @@ def submit_leave(data: LeaveRequest):
         raise HTTPException(status_code=400, detail="Failed to submit leave request")
     return {"status": "success", "message": "Leave request submitted"}
 
+# The listings skip jsonable_encoder and can be columnar and/or compressed, see IFS140api/encoding.py
 @app.get("/leave/view/{emp_id}")
-def view_my_requests(emp_id: str):
+def view_my_requests(emp_id: str, request: Request):
     requests = services.view_leave_requests(emp_id)
-    return {"status": "success", "requests": requests}
+    return listing_response(request, "requests", MY_REQUEST_COLUMNS, requests)
 
 @app.get("/leave/view_all")
-def view_all():
-    return {"status": "success", "requests": services.view_all_leave_requests()}
+def view_all(request: Request):
+    return listing_response(request, "requests", ALL_REQUEST_COLUMNS, services.view_all_leave_requests())
 
 @app.post("/leave/approve/{request_id}")
 def approve(request_id: int):
@@ -83,8 +160,8 @@ def deny(request_id: int):
 
 # Staff Managment
 @app.get("/staff/all")
-def view_staff():
-    return {"status": "success", "employees": services.view_all_staff()}
+def view_staff(request: Request):
+    return listing_response(request, "employees", STAFF_COLUMNS, services.view_all_staff())
 
 @app.get("/staff", response_model=List[EmployeeOut])
 def api_list_employees():
@@ -0,0 +1,101 @@
+import os
+import time
+
+from fastapi.responses import JSONResponse
+
+from IFS140backend.IFSdb import current_tenant, get_tenants
+from IFS140backend.IFStenants import TENANT_REQUIRED
+from IFS140backend.IFSmetrics import HTTP_LATENCY, HTTP_RESPONSES, JSON_ENCODE
+
+# With IFS_TENANT_DOMAIN=clockedin.example.com, acme.clockedin.example.com is tenant "acme"
+TENANT_DOMAIN = os.environ.get("IFS_TENANT_DOMAIN", "").lower().lstrip(".")
+
+# Paths that belong to the process rather than a tenant (probes, scrapes, docs)
+TENANT_FREE_PATHS = ("/healthz", "/readyz", "/metrics", "/admin/profiles", "/docs", "/redoc", "/openapi.json")
+
+
+class MetricsMiddleware:
+    """Records latency and status code per route. Written as plain ASGI rather than
+    @app.middleware("http") so it doesn't add a task and a response copy per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # the router stores the matched route in the scope; label by its
+            # path template so /leave/view/{emp_id} stays a single series
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - start, method, path)
+            HTTP_RESPONSES.inc(method, path, str(status["code"]))
+
+
+class TimedJSONResponse(JSONResponse):
+    """Default response class for the API, timing the json.dumps step."""
+
+    def render(self, content) -> bytes:
+        with JSON_ENCODE.time():
+            return super().render(content)
+
+
+class TenantMiddleware:
+    """Picks the tenant from the X-Tenant header or the subdomain and points the
+    services at that tenant's database for the rest of the request. Requests
+    without a tenant are refused with 400 while TENANT_REQUIRED is on (the
+    default with IFS_TENANT_DIR), otherwise they use the default database."""
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def tenant_from(scope):
+        headers = dict(scope["headers"])
+        tenant = headers.get(b"x-tenant")
+        if tenant:
+            return tenant.decode("latin-1").strip().lower()
+        if TENANT_DOMAIN:
+            host = headers.get(b"host", b"").decode("latin-1").split(":")[0].lower()
+            if host.endswith("." + TENANT_DOMAIN):
+                return host[: -len(TENANT_DOMAIN) - 1]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = self.tenant_from(scope)
+        if tenant is None:
+            path = scope["path"]
+            if TENANT_REQUIRED and not any(path == p or path.startswith(p + "/") for p in TENANT_FREE_PATHS):
+                response = JSONResponse(status_code=400, content={"detail": "No tenant given, send the X-Tenant header"})
+                await response(scope, receive, send)
+                return
+            await self.app(scope, receive, send)
+            return
+        if not get_tenants().exists(tenant):
+            response = JSONResponse(status_code=404, content={"detail": f"Unknown tenant '{tenant}'"})
+            await response(scope, receive, send)
+            return
+
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
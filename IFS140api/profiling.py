@@ -0,0 +1,351 @@
+"""Opt-in profiling of single API requests.
+
+Off unless IFS_PROFILE_TOKEN is set; then a request sent with the header
+`X-Profile-Token: <token>` (or any request to a path listed in
+IFS_PROFILE_PATHS) is profiled and the result kept in a small ring buffer:
+
+    GET /admin/profiles                       list captured profiles
+    GET /admin/profiles/{id}?format=text      top functions (cProfile)
+    GET /admin/profiles/{id}?format=pstats    marshal dump for pstats/snakeviz
+    GET /admin/profiles/{id}?format=collapsed folded stacks for flamegraph.pl / speedscope
+
+Profile ids are "<pid>-<n>". With IFS_PROFILE_DIR set (the multi-worker
+launcher sets it) profiles are written there as files so whichever worker
+answers /admin/profiles sees the ones captured by every worker; otherwise
+they stay in this process's memory.
+
+The default mode is cProfile. Send `X-Profile-Mode: sample` to use the
+sampling profiler instead, which is the one that produces collapsed stacks.
+Only one request per worker is profiled at a time; the event-loop part of the
+profile can include other requests that were awaiting at the same time.
+"""
+import asyncio
+import contextvars
+import hmac
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+# cProfile, pstats, marshal and io are imported where they're used: main.py
+# imports this module on every start but profiling is normally switched off
+
+PROFILE_TOKEN = os.environ.get("IFS_PROFILE_TOKEN", "")
+PROFILE_PATHS = {p.strip() for p in os.environ.get("IFS_PROFILE_PATHS", "").split(",") if p.strip()}
+PROFILE_BUFFER_SIZE = int(os.environ.get("IFS_PROFILE_BUFFER", "20"))
+SAMPLE_INTERVAL = float(os.environ.get("IFS_PROFILE_SAMPLE_INTERVAL", "0.001"))
+PROFILE_DIR = os.environ.get("IFS_PROFILE_DIR", "")
+PROFILE_ID = re.compile(r"^\d+-\d+$")
+# Reading the captures back is never profiled, or browsing them would push
+# the real ones out of the ring buffer
+ADMIN_PREFIX = "/admin/profiles"
+
+# From 3.12 cProfile is built on sys.monitoring, which is global to the
+# interpreter: the profiler enabled on the event loop already sees the
+# threadpool threads and enabling a second one raises ValueError
+GLOBAL_PROFILER = sys.version_info >= (3, 12)
+
+_profiles: deque = deque(maxlen=PROFILE_BUFFER_SIZE)
+_ids = itertools.count(1)
+_current: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("ifs_profile", default=None)
+_busy = False
+
+
+def enabled() -> bool:
+    return bool(PROFILE_TOKEN)
+
+
+def check_token(token: Optional[str]) -> bool:
+    return enabled() and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    """Polls the stacks of the registered threads and counts folded stacks."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="ifs-profile-sampler", daemon=True)
+        self.interval = interval
+        self.thread_ids = set()
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for tid in list(self.thread_ids):
+                frame = frames.get(tid)
+                if frame is None or tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    """Profile of one request, possibly spread over the event loop and a threadpool thread."""
+
+    def __init__(self, mode: str, method: str, path: str):
+        self.id = f"{os.getpid()}-{next(_ids)}"
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started = time.time()
+        self.duration = 0.0
+        self.profilers: List[Any] = []
+        self.sampler = _Sampler(SAMPLE_INTERVAL) if mode == "sample" else None
+        self.stats: Dict[Any, Any] = {}
+        self.stacks: Dict[str, int] = {}
+
+    # Start profiling the calling thread; returns a token for stop_thread
+    def start_thread(self):
+        if self.sampler is not None:
+            tid = threading.get_ident()
+            self.sampler.thread_ids.add(tid)
+            return tid
+        if GLOBAL_PROFILER and self.profilers:
+            return None
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        if GLOBAL_PROFILER:
+            self.profilers.append(profiler)
+        return profiler
+
+    def stop_thread(self, handle):
+        if handle is None:
+            return
+        if self.sampler is not None:
+            self.sampler.thread_ids.discard(handle)
+        elif GLOBAL_PROFILER:
+            handle.disable()
+        else:
+            handle.disable()
+            self.profilers.append(handle)
+
+    def finish(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.stacks = dict(self.sampler.stacks)
+            self.sampler = None
+        elif self.profilers:
+            import pstats
+            self.stats = pstats.Stats(*self.profilers).stats
+        self.profilers = []
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started": self.started,
+            "duration_ms": self.duration * 1000,
+        }
+
+    # The finished profile as plain dicts and tuples, marshal-able like a pstats dump
+    def to_record(self) -> Dict[str, Any]:
+        return {"summary": self.summary(), "stats": self.stats, "stacks": self.stacks}
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "RequestProfile":
+        summary = record["summary"]
+        profile = cls.__new__(cls)
+        profile.id = summary["id"]
+        profile.mode = summary["mode"]
+        profile.method = summary["method"]
+        profile.path = summary["path"]
+        profile.status = summary["status"]
+        profile.started = summary["started"]
+        profile.duration = summary["duration_ms"] / 1000
+        profile.profilers = []
+        profile.sampler = None
+        profile.stats = record["stats"]
+        profile.stacks = record["stacks"]
+        return profile
+
+    def render(self, fmt: str):
+        """Returns (bytes, media type) or raises ValueError for a format the mode can't produce."""
+        if fmt == "collapsed":
+            if self.mode != "sample":
+                raise ValueError("collapsed stacks need a sampled profile (X-Profile-Mode: sample)")
+            text = "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+            return text.encode(), "text/plain"
+        if self.mode != "cprofile":
+            raise ValueError("pstats and text output need a cProfile profile")
+        if fmt == "pstats":
+            import marshal
+            return marshal.dumps(self.stats), "application/octet-stream"
+        if fmt == "text":
+            import io
+            import pstats
+            stats = pstats.Stats(_StatsHolder(self.stats), stream=io.StringIO())
+            stats.sort_stats("cumulative").print_stats(50)
+            return stats.stream.getvalue().encode(), "text/plain"
+        raise ValueError(f"Unknown format '{fmt}'")
+
+
+class _StatsHolder:
+    # pstats.Stats loads anything with a create_stats()/stats pair
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+
+
+# Newest first; files another worker removes while we look are skipped
+def _stored_files() -> List[str]:
+    found = []
+    try:
+        for entry in os.scandir(PROFILE_DIR):
+            if entry.name.endswith(".prof"):
+                try:
+                    found.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+    except FileNotFoundError:
+        return []
+    return [path for _, path in sorted(found, reverse=True)]
+
+
+def _load(path: str) -> Optional[RequestProfile]:
+    import marshal
+    try:
+        with open(path, "rb") as f:
+            return RequestProfile.from_record(marshal.load(f))
+    except (OSError, EOFError, ValueError, KeyError, TypeError):
+        return None
+
+
+# Keep a finished profile: in PROFILE_DIR, trimmed to the newest PROFILE_BUFFER_SIZE
+# files across all workers, or in this process's ring buffer
+def _store(profile: RequestProfile) -> None:
+    if not PROFILE_DIR:
+        _profiles.append(profile)
+        return
+    import marshal
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = _profile_path(profile.id)
+    with open(path + ".tmp", "wb") as f:
+        marshal.dump(profile.to_record(), f)
+    os.replace(path + ".tmp", path)
+    for old in _stored_files()[PROFILE_BUFFER_SIZE:]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass  # another worker trimmed it first
+
+
+def get_profile(profile_id: str) -> Optional[RequestProfile]:
+    if not PROFILE_ID.match(profile_id):
+        return None
+    if PROFILE_DIR:
+        return _load(_profile_path(profile_id))
+    for profile in list(_profiles):
+        if profile.id == profile_id:
+            return profile
+    return None
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    if PROFILE_DIR:
+        profiles = (_load(path) for path in _stored_files())
+        return [p.summary() for p in profiles if p is not None]
+    return [p.summary() for p in reversed(list(_profiles))]
+
+
+def profiled(endpoint):
+    """Wrap a sync endpoint so the threadpool thread it runs on is profiled too."""
+    if asyncio.iscoroutinefunction(endpoint):
+        return endpoint  # runs on the event loop, already covered by the middleware
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        handle = profile.start_thread()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.stop_thread(handle)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    def _wants_profile(self, scope) -> Optional[str]:
+        path = scope["path"]
+        if path == ADMIN_PREFIX or path.startswith(ADMIN_PREFIX + "/"):
+            return None
+        headers = dict(scope["headers"])
+        token = headers.get(b"x-profile-token")
+        if not (token and check_token(token.decode("latin-1"))) and path not in PROFILE_PATHS:
+            return None
+        mode = headers.get(b"x-profile-mode", b"cprofile").decode("latin-1").lower()
+        return "sample" if mode == "sample" else "cprofile"
+
+    async def __call__(self, scope, receive, send):
+        global _busy
+        mode = self._wants_profile(scope) if scope["type"] == "http" and not _busy else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        _busy = True
+        profile = RequestProfile(mode, scope["method"], scope["path"])
+        context_token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        if profile.sampler is not None:
+            profile.sampler.start()
+        handle = profile.start_thread()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.stop_thread(handle)
+            profile.duration = time.perf_counter() - start
+            _current.reset(context_token)
+            profile.finish()
+            _store(profile)
+            _busy = False
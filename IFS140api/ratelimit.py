@@ -0,0 +1,313 @@
+"""Login throttling so bad-password floods can't tie up every core in PBKDF2.
+
+Before the KDF runs, a /login attempt takes a token from two buckets: one per
+client IP (stops a single client spraying many accounts) and one per emp_id
+(stops many clients hammering one account). The tokens are taken up front so
+concurrent attempts can't all slip past while the KDF runs, and a successful
+login gives them back, so a rush of good logins from one office NAT costs
+nothing. An (emp_id, IP) pair that logged in successfully within LOGIN_TRUST_SECONDS skips
+both buckets, so someone guessing a password can't lock its owner out from
+their usual address. Repeated failures for the same emp_id from the same IP
+also lock that pair out for an exponentially growing time. Every refusal
+answers 429 with a Retry-After header.
+
+State lives in a RateLimitStore. MemoryStore is per worker process; set
+IFS_RATELIMIT_STORE=sqlite to share the counters between the workers on a host
+(the multi-worker launcher does this by default).
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException
+
+from IFS140backend.IFSdb import current_tenant
+from IFS140backend.IFSmetrics import Counter
+
+# (burst, tokens refilled per second)
+IP_LIMIT = (float(os.environ.get("IFS_LOGIN_IP_BURST", "20")), float(os.environ.get("IFS_LOGIN_IP_RATE", "0.5")))
+EMP_LIMIT = (float(os.environ.get("IFS_LOGIN_EMP_BURST", "10")), float(os.environ.get("IFS_LOGIN_EMP_RATE", "0.2")))
+
+# consecutive failures before the lockout starts, first lockout and maximum lockout in seconds
+LOCKOUT_THRESHOLD = int(os.environ.get("IFS_LOGIN_LOCKOUT_AFTER", "5"))
+LOCKOUT_BASE = float(os.environ.get("IFS_LOGIN_LOCKOUT_BASE", "2"))
+LOCKOUT_MAX = float(os.environ.get("IFS_LOGIN_LOCKOUT_MAX", "900"))
+
+# A successful login from an IP exempts that (emp_id, IP) pair from the buckets for this long
+LOGIN_TRUST_SECONDS = float(os.environ.get("IFS_LOGIN_TRUST_SECONDS", str(30 * 24 * 3600)))
+
+# Honour X-Forwarded-For, only when the API sits behind a proxy that sets it.
+# Each proxy appends the address it got the request from, so the client is the
+# entry TRUSTED_PROXIES from the right; anything further left is client-supplied.
+TRUST_FORWARDED = os.environ.get("IFS_TRUST_FORWARDED", "") == "1"
+TRUSTED_PROXIES = max(1, int(os.environ.get("IFS_TRUSTED_PROXIES", "1")))
+
+RATE_LIMITED = Counter("ifs_login_rate_limited_total", "Login attempts refused before hashing", ("reason",))
+
+
+class RateLimitStore(ABC):
+    # Give back a token taken by take(), never going over the burst
+    @abstractmethod
+    def refund(self, key: str, burst: float) -> None:
+        ...
+
+    # Spend one token; returns 0 if there was one, otherwise the seconds until there is
+    @abstractmethod
+    def take(self, key: str, burst: float, rate: float, now: float) -> float:
+        ...
+
+    # Seconds left on a lockout, 0 if not locked
+    @abstractmethod
+    def locked_for(self, key: str, now: float) -> float:
+        ...
+
+    @abstractmethod
+    def record_failure(self, key: str, now: float) -> None:
+        ...
+
+    @abstractmethod
+    def reset(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def record_success(self, key: str, now: float) -> None:
+        ...
+
+    # Time of the last recorded success for key, 0 if none
+    @abstractmethod
+    def last_success(self, key: str) -> float:
+        ...
+
+
+def _refill(tokens: float, updated: float, burst: float, rate: float, now: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+def _wait(tokens: float, rate: float) -> float:
+    return (1 - tokens) / rate if rate > 0 else LOCKOUT_MAX
+
+
+def _lockout_seconds(failures: int) -> float:
+    if failures < LOCKOUT_THRESHOLD:
+        return 0.0
+    return min(LOCKOUT_MAX, LOCKOUT_BASE * 2 ** (failures - LOCKOUT_THRESHOLD))
+
+
+class MemoryStore(RateLimitStore):
+    """Bounded in-process store. Buckets are two-item lists in an LRU ordered dict,
+    so a flood of random emp_ids or IPs can't grow memory past max_keys."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._failures: "OrderedDict[str, list]" = OrderedDict()  # key -> [count, locked_until]
+        self._successes: "OrderedDict[str, list]" = OrderedDict()  # key -> [when]
+
+    def _touch(self, table: OrderedDict, key: str, default: list) -> list:
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = default
+            if len(table) > self.max_keys:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return entry
+
+    def refund(self, key: str, burst: float) -> None:
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is not None:
+                entry[0] = min(burst, entry[0] + 1)
+
+    def take(self, key: str, burst: float, rate: float, now: float) -> float:
+        with self._lock:
+            entry = self._touch(self._buckets, key, [burst, now])
+            tokens = _refill(entry[0], entry[1], burst, rate, now)
+            entry[1] = now
+            if tokens >= 1:
+                entry[0] = tokens - 1
+                return 0.0
+            entry[0] = tokens
+            return _wait(tokens, rate)
+
+    def locked_for(self, key: str, now: float) -> float:
+        entry = self._failures.get(key)
+        return max(0.0, entry[1] - now) if entry else 0.0
+
+    def record_failure(self, key: str, now: float) -> None:
+        with self._lock:
+            entry = self._touch(self._failures, key, [0, 0.0])
+            entry[0] += 1
+            lockout = _lockout_seconds(entry[0])
+            if lockout:
+                entry[1] = now + lockout
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def record_success(self, key: str, now: float) -> None:
+        with self._lock:
+            self._touch(self._successes, key, [now])[0] = now
+
+    def last_success(self, key: str) -> float:
+        entry = self._successes.get(key)
+        return entry[0] if entry else 0.0
+
+
+class SQLiteStore(RateLimitStore):
+    """Store shared by every worker on the host through a small SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS failures (key TEXT PRIMARY KEY, count INTEGER, locked_until REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS successes (key TEXT PRIMARY KEY, updated REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def refund(self, key: str, burst: float) -> None:
+        self._conn().execute("UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?", (burst, key))
+
+    def take(self, key: str, burst: float, rate: float, now: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0], row[1], burst, rate, now) if row else burst
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = _wait(tokens, rate)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def locked_for(self, key: str, now: float) -> float:
+        row = self._conn().execute("SELECT locked_until FROM failures WHERE key = ?", (key,)).fetchone()
+        return max(0.0, row[0] - now) if row else 0.0
+
+    def record_failure(self, key: str, now: float) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT count, locked_until FROM failures WHERE key = ?", (key,)).fetchone()
+            count, locked_until = (row[0] + 1, row[1]) if row else (1, 0.0)
+            lockout = _lockout_seconds(count)
+            if lockout:
+                locked_until = now + lockout
+            conn.execute("INSERT OR REPLACE INTO failures (key, count, locked_until) VALUES (?, ?, ?)", (key, count, locked_until))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reset(self, key: str) -> None:
+        self._conn().execute("DELETE FROM failures WHERE key = ?", (key,))
+
+    def record_success(self, key: str, now: float) -> None:
+        self._conn().execute("INSERT OR REPLACE INTO successes (key, updated) VALUES (?, ?)", (key, now))
+
+    def last_success(self, key: str) -> float:
+        row = self._conn().execute("SELECT updated FROM successes WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0.0
+
+
+_store: Optional[RateLimitStore] = None
+
+
+def get_store() -> RateLimitStore:
+    global _store
+    if _store is None:
+        if os.environ.get("IFS_RATELIMIT_STORE", "memory") == "sqlite":
+            _store = SQLiteStore(os.environ.get("IFS_RATELIMIT_DB", "ratelimit.db"))
+        else:
+            _store = MemoryStore()
+    return _store
+
+
+def set_store(store: Optional[RateLimitStore]):
+    global _store
+    _store = store
+
+
+def client_ip(request) -> str:
+    if TRUST_FORWARDED:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= TRUSTED_PROXIES:
+            return forwarded[-TRUSTED_PROXIES]
+    return request.client.host if request.client else "unknown"
+
+
+def _refuse(reason: str, wait: float):
+    RATE_LIMITED.inc(reason)
+    raise HTTPException(
+        status_code=429,
+        detail="Too many login attempts, try again later.",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))},
+    )
+
+
+# emp_ids are only unique within a tenant, so the per-account keys include it
+def _account(emp_id: str) -> str:
+    return f"{current_tenant.get() or ''}/{emp_id}"
+
+
+def _trusted(store: RateLimitStore, account: str, ip: str, now: float) -> bool:
+    return now - store.last_success(f"ok:{account}:{ip}") < LOGIN_TRUST_SECONDS
+
+
+# Cheap checks run before authenticate_user; raises 429 if the attempt is refused.
+# Returns True if tokens were taken, pass it on to login_succeeded.
+def check_login(ip: str, emp_id: str) -> bool:
+    store = get_store()
+    now = time.time()
+    account = _account(emp_id)
+
+    locked = store.locked_for(f"lock:{account}:{ip}", now)
+    if locked:
+        _refuse("lockout", locked)
+
+    if _trusted(store, account, ip, now):
+        return False
+
+    wait = store.take(f"ip:{ip}", IP_LIMIT[0], IP_LIMIT[1], now)
+    if wait:
+        _refuse("ip", wait)
+
+    wait = store.take(f"emp:{account}", EMP_LIMIT[0], EMP_LIMIT[1], now)
+    if wait:
+        store.refund(f"ip:{ip}", IP_LIMIT[0])  # this attempt never reaches the KDF
+        _refuse("emp_id", wait)
+    return True
+
+
+def login_failed(ip: str, emp_id: str) -> None:
+    get_store().record_failure(f"lock:{_account(emp_id)}:{ip}", time.time())
+
+
+def login_succeeded(ip: str, emp_id: str, charged: bool = True) -> None:
+    store = get_store()
+    account = _account(emp_id)
+    if charged:
+        store.refund(f"ip:{ip}", IP_LIMIT[0])
+        store.refund(f"emp:{account}", EMP_LIMIT[0])
+    store.reset(f"lock:{account}:{ip}")
+    store.record_success(f"ok:{account}:{ip}", time.time())
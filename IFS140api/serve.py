@@ -0,0 +1,120 @@
+"""Production entry point: runs the API with several uvicorn worker processes.
+
+    python -m IFS140api.serve --workers 4 --port 8000
+
+Unlike `uvicorn --reload` this seeds the database once per launch (see
+setup_database_once) and shuts down gracefully: on SIGTERM/SIGINT each worker
+first keeps serving for --drain-delay seconds with /readyz answering 503, so a
+load balancer can take it out of rotation, then closes the listener and lets
+in-flight requests finish. A second Ctrl+C skips the delay.
+"""
+import argparse
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import uuid
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn only runs the app's shutdown handlers after the sockets are closed,
+    which is too late to tell a load balancer, so the draining flag is set here
+    as soon as the signal arrives."""
+
+    def __init__(self, config: uvicorn.Config, drain_delay: float):
+        super().__init__(config)
+        self.drain_delay = drain_delay
+        self.drain_deadline = None
+        self.drain_signal = None
+
+    def handle_exit(self, sig, frame):
+        if self.drain_deadline is None and self.drain_delay > 0 and not self.should_exit:
+            self.drain_deadline = time.monotonic() + self.drain_delay
+            self.drain_signal = sig
+            # the app module is already imported in a serving worker
+            api = sys.modules.get("IFS140api.main")
+            if api is not None:
+                api.start_draining()
+            return
+        if self.drain_deadline is not None and sig != signal.SIGINT:
+            # Ctrl+C also makes the supervisor send SIGTERM; only another Ctrl+C cuts the delay short
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.drain_deadline is not None and not self.should_exit and time.monotonic() >= self.drain_deadline:
+            super().handle_exit(self.drain_signal, None)
+        return await super().on_tick(counter)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the ClockedIn API with multiple workers")
+    parser.add_argument("--host", default=os.environ.get("IFS_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("IFS_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("IFS_WORKERS", os.cpu_count() or 1)),
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument("--drain-seconds", type=int, default=int(os.environ.get("IFS_DRAIN_SECONDS", "15")),
+                        help="how long to wait for in-flight requests on shutdown")
+    parser.add_argument("--drain-delay", type=float, default=float(os.environ.get("IFS_DRAIN_DELAY", "5")),
+                        help="seconds to keep serving with /readyz failing before the listener closes")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Workers inherit the environment, so they all see the same token and
+    # only the first one to take the init lock seeds the database
+    os.environ["IFS_INIT_TOKEN"] = uuid.uuid4().hex
+
+    # Requests are spread over the workers by the kernel, so a scrape of /metrics
+    # reaches a random one; they share snapshots through this directory and each
+    # answers with the total (see IFS140backend/IFSmetrics.py). It is always a fresh
+    # directory of our own, made inside IFS_METRICS_DIR when that is set.
+    own_metrics_dir = None
+    if args.workers > 1:
+        parent = os.environ.get("IFS_METRICS_DIR") or None
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        own_metrics_dir = tempfile.mkdtemp(prefix="ifs-metrics-", dir=parent)
+        os.environ["IFS_METRICS_DIR"] = own_metrics_dir
+
+    # Same for captured profiles, so /admin/profiles/{id} works whichever worker answers
+    own_profile_dir = None
+    if args.workers > 1 and os.environ.get("IFS_PROFILE_TOKEN") and not os.environ.get("IFS_PROFILE_DIR"):
+        os.environ["IFS_PROFILE_DIR"] = own_profile_dir = tempfile.mkdtemp(prefix="ifs-profiles-")
+
+    # Login throttling has to see every worker's attempts, so share its counters
+    if args.workers > 1:
+        os.environ.setdefault("IFS_RATELIMIT_STORE", "sqlite")
+
+    # Same as uvicorn.run, but with DrainingServer in every worker
+    config = uvicorn.Config(
+        "IFS140api.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.drain_seconds,
+        log_level=args.log_level,
+    )
+    server = DrainingServer(config, drain_delay=args.drain_delay)
+    try:
+        if config.workers > 1:
+            sock = config.bind_socket()
+            Multiprocess(config, target=server.run, sockets=[sock]).run()
+        else:
+            server.run()
+    finally:
+        for own_dir in (own_metrics_dir, own_profile_dir):
+            if own_dir:
+                shutil.rmtree(own_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,34 @@
-import sqlite3
+import os
+from contextvars import ContextVar
+try:
+    import fcntl
+except ImportError:  # Windows; the multi-worker launcher is only supported on POSIX
+    fcntl = None
 from pathlib import Path
 from .IFSsecurity import hash_password
-from typing import Dict
+from .IFSstorage import Repository, SQLiteRepository, PostgresRepository, MemoryRepository
+from .IFStenants import TenantRegistry, TENANT_DIR, TENANTS
+from typing import Dict, Optional
 
 DB_FILE = "test1.db"
 
+# Storage backend: "sqlite" (DB_FILE), "postgres" (IFS_DB_DSN) or "memory"
+DB_BACKEND = os.environ.get("IFS_DB_BACKEND", "sqlite")
+DB_DSN = os.environ.get("IFS_DB_DSN", "")
+DB_POOL_SIZE = int(os.environ.get("IFS_DB_POOL_SIZE", "10"))
+
+_repository: Optional[Repository] = None
+
+# Tenant of the request being handled (set by the API's TenantMiddleware); None means DB_FILE
+current_tenant: ContextVar[Optional[str]] = ContextVar("ifs_tenant", default=None)
+# Seed the sample employees into new tenant databases as well (off by default)
+TENANT_SEED = os.environ.get("IFS_TENANT_SEED", "") == "1"
+_tenants: Optional[TenantRegistry] = None
+
+# Set by the multi-worker launcher (IFS140api/serve.py) so the workers it starts
+# know they belong to the same launch and only one of them seeds the database
+INIT_TOKEN = os.environ.get("IFS_INIT_TOKEN", "")
+
 # Path created to the database 
 def ensure_parent():
     Path(DB_FILE).parent.mkdir(parents=True, exist_ok=True)
@@ -26,46 +50,82 @@ employees_data: Dict[str, dict] = {
 }
 
 def setup_database():
+    migrate_repository(get_repository())
+
+# Create the tables and, if seed is set, the sample employees
+def migrate_repository(repo: Repository, seed: bool = True):
+    repo.create_schema()
+    if not seed:
+        return
+    # seed the data into the database for testing. Only missing employees are
+    # hashed and inserted, so a warm start doesn't pay for a PBKDF2 run per seed user
+    rows = []
+    for emp_id, details in employees_data.items():
+        if repo.employee_exists(emp_id):
+            continue
+        plain = str(details.get("password", ""))
+        hashed, salt = hash_password(plain)
+        rows.append((emp_id, details["name"], hashed, salt, int(details.get("leave_available", 0)), details.get("role", "Staff")))
+    repo.seed_employees(rows)
+
+# Run setup_database once per launch, however many workers start at the same time.
+# The first worker to take the lock does the work and writes the launch token into
+# the lock file, the rest wait on the lock, see the token and skip.
+# Returns True if this process did the setup.
+def setup_database_once() -> bool:
+    if not INIT_TOKEN or fcntl is None or DB_BACKEND == "memory":
+        setup_database()
+        return True
+
     ensure_parent()
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS employees (
-            emp_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            password TEXT NOT NULL,
-            salt TEXT NOT NULL,
-            leave_available INTEGER NOT NULL DEFAULT 0,
-            role TEXT NOT NULL
-        )
-        """)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS leave_requests (
-            request_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            emp_id TEXT NOT NULL,
-            leave_type TEXT NOT NULL,
-            description TEXT,
-            days_requested INTEGER NOT NULL,
-            paid_leave INTEGER NOT NULL,
-            status TEXT DEFAULT 'Pending',
-            FOREIGN KEY (emp_id) REFERENCES employees(emp_id)
-        )
-        """)
-        # seed the data into the database for testing
-        for emp_id, details in employees_data.items():
-            plain = str(details.get("password", ""))
-            hashed, salt = hash_password(plain)
-            cursor.execute(
-                """
-                INSERT OR REPLACE INTO employees
-                (emp_id, name, password, salt, leave_available, role)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (emp_id, details["name"], hashed, salt, int(details.get("leave_available", 0)), details.get("role", "Staff")),
-            )
-        conn.commit()
-
-# Easy to use connect fuction for our backend functions
-def get_conn():
-    return sqlite3.connect(str(DB_FILE))
+    with open(f"{DB_FILE}.init.lock", "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            lock.seek(0)
+            if lock.read().strip() == INIT_TOKEN:
+                return False
+            setup_database()
+            lock.seek(0)
+            lock.truncate()
+            lock.write(INIT_TOKEN)
+            lock.flush()
+            return True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def tenancy_enabled() -> bool:
+    return bool(TENANT_DIR)
+
+def get_tenants() -> TenantRegistry:
+    global _tenants
+    if _tenants is None:
+        if DB_BACKEND != "sqlite":
+            raise ValueError("Per-tenant databases are only supported with the sqlite backend")
+        _tenants = TenantRegistry(TENANT_DIR, lambda repo: migrate_repository(repo, seed=TENANT_SEED), TENANTS)
+    return _tenants
+
+# The repository every service function goes through, created on first use.
+# Inside a tenant's request this is that tenant's database.
+def get_repository() -> Repository:
+    global _repository
+    tenant = current_tenant.get()
+    if tenant is not None:
+        return get_tenants().get(tenant)
+    if _repository is None:
+        if DB_BACKEND == "sqlite":
+            _repository = SQLiteRepository(DB_FILE, pool_size=DB_POOL_SIZE)
+        elif DB_BACKEND == "postgres":
+            _repository = PostgresRepository(DB_DSN, max_connections=DB_POOL_SIZE)
+        elif DB_BACKEND == "memory":
+            _repository = MemoryRepository()
+        else:
+            raise ValueError(f"Unknown IFS_DB_BACKEND '{DB_BACKEND}'")
+    return _repository
+
+# Swap the active repository, e.g. to point the services at a scratch database
+def set_repository(repo: Optional[Repository]):
+    global _repository
+    if _repository is not None and _repository is not repo:
+        _repository.close()
+    _repository = repo
 
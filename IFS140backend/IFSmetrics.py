@@ -0,0 +1,256 @@
+"""Small in-process metrics registry rendered in the Prometheus text format.
+
+Recording is a dict lookup and a couple of integer increments under a lock;
+the text is only built when /metrics is scraped.
+
+Every worker process keeps its own registry. When IFS_METRICS_DIR is set (the
+multi-worker launcher sets it) each worker also writes a snapshot of its
+registry to <dir>/<pid>.json every IFS_METRICS_FLUSH seconds (if anything was
+recorded since the last write), and a scrape
+served by any worker adds up the snapshots of all of them. Files of workers
+that have exited are kept so the counters never go backwards.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+METRICS_DIR = os.environ.get("IFS_METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.environ.get("IFS_METRICS_FLUSH", "1"))
+
+# Upper bounds in seconds, from a cache-hot query up to a slow KDF on a busy box
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_registry: List["Metric"] = []
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._changes = 0  # bumped on every update, tells the snapshot writer if there's anything new
+        _registry.append(self)
+
+    # Copy of the recorded values, keyed by label values
+    @abstractmethod
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        ...
+
+    # Add the values of another process's snapshot into a snapshot of this metric
+    @abstractmethod
+    def merge(self, into: Dict[Tuple[str, ...], Any], other: Dict[Tuple[str, ...], Any]) -> None:
+        ...
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], Any]] = None) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+            self._changes += 1
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, into: Dict[Tuple[str, ...], float], other: Dict[Tuple[str, ...], float]) -> None:
+        for label_values, value in other.items():
+            into[label_values] = into.get(label_values, 0) + value
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        lines = super().render()
+        if values is None:
+            values = self.snapshot()
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+            self._changes += 1
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        entry = self._values.get(label_values)
+        return sum(entry[0]) if entry else 0
+
+    def snapshot(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {k: [list(v[0]), v[1]] for k, v in self._values.items()}
+
+    def merge(self, into: Dict[Tuple[str, ...], list], other: Dict[Tuple[str, ...], list]) -> None:
+        for label_values, (counts, total) in other.items():
+            entry = into.get(label_values)
+            if entry is None or len(entry[0]) != len(counts):
+                into[label_values] = [list(counts), total]
+            else:
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], list]] = None) -> List[str]:
+        lines = super().render()
+        if values is None:
+            values = self.snapshot()
+        for label_values, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+# Metrics recorded by the backend and the API
+HTTP_LATENCY = Histogram("ifs_http_request_duration_seconds", "Time spent handling HTTP requests", ("method", "route"))
+HTTP_RESPONSES = Counter("ifs_http_responses_total", "HTTP responses by status code", ("method", "route", "status"))
+JSON_ENCODE = Histogram("ifs_json_encode_seconds", "Time spent serializing JSON responses")
+SERVICE_LATENCY = Histogram("ifs_service_duration_seconds", "Time spent in IFSservices functions", ("function",))
+KDF_LATENCY = Histogram("ifs_password_kdf_seconds", "Time spent in PBKDF2 password hashing")
+DB_QUERIES = Counter("ifs_db_queries_total", "SQL statements executed", ("backend",))
+DB_CONNECTION_WAIT = Histogram("ifs_db_connection_wait_seconds", "Time spent opening or checking out a DB connection", ("backend",))
+
+
+# Decorator recording how long a service function takes
+def timed(func):
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            SERVICE_LATENCY.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
+# Write this process's registry to METRICS_DIR; the file is replaced atomically
+# so a worker reading it during a scrape never sees half a snapshot. Skipped when
+# nothing was recorded since the last write, so an idle worker doesn't touch the disk.
+_written_changes = -1
+
+
+def write_snapshot() -> None:
+    global _written_changes
+    if not METRICS_DIR:
+        return
+    changes = sum(m._changes for m in list(_registry))
+    if changes == _written_changes:
+        return
+    data = {m.name: [[list(k), v] for k, v in m.snapshot().items()] for m in list(_registry)}
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+    _written_changes = changes
+
+
+def _read_snapshots() -> Dict[str, Dict[Tuple[str, ...], Any]]:
+    merged: Dict[str, Dict[Tuple[str, ...], Any]] = {m.name: {} for m in _registry}
+    metrics = {m.name: m for m in _registry}
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # a worker is replacing it right now, its next snapshot is picked up next scrape
+        for name, items in data.items():
+            if name in metrics:
+                metrics[name].merge(merged[name], {tuple(k): v for k, v in items})
+    return merged
+
+
+_writer: Optional[threading.Thread] = None
+
+
+# Start the background thread that keeps this worker's snapshot fresh
+def start_snapshot_writer() -> None:
+    global _writer
+    if not METRICS_DIR or _writer is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                write_snapshot()
+            except OSError:
+                pass
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    write_snapshot()
+    atexit.register(write_snapshot)  # keep what was recorded since the last flush
+    _writer = threading.Thread(target=run, name="ifs-metrics-writer", daemon=True)
+    _writer.start()
+
+
+def render_metrics() -> str:
+    merged = None
+    if METRICS_DIR:
+        write_snapshot()
+        merged = _read_snapshots()
+    lines: List[str] = []
+    for metric in list(_registry):
+        lines.extend(metric.render(merged[metric.name] if merged is not None else None))
+    return "\n".join(lines) + "\n"
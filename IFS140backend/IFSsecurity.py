@@ -2,6 +2,7 @@ import hashlib
 import secrets
 import hmac
 from typing import Tuple
+from .IFSmetrics import KDF_LATENCY
 
 # Number of iterations for PBKDF2
 _ITERATIONS = 100000
@@ -14,12 +15,13 @@ def hash_password(password: str, salt: str = None) -> Tuple[str, str]:
     if not salt:
         salt = secrets.token_hex(16)  
 
-    hashed = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        salt.encode("utf-8"),
-        _ITERATIONS,
-    ).hex()
+    with KDF_LATENCY.time():
+        hashed = hashlib.pbkdf2_hmac(
+            "sha256",
+            password.encode("utf-8"),
+            salt.encode("utf-8"),
+            _ITERATIONS,
+        ).hex()
 
     return hashed, salt
 
@@ -0,0 +1,520 @@
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from .IFSmetrics import DB_QUERIES, DB_CONNECTION_WAIT
+
+# Column order shared by every backend so the services (and the API) see the same shapes
+EMPLOYEE_COLUMNS = ("emp_id", "name", "password", "salt", "leave_available", "role")
+
+# Tuple layouts returned by the listing methods, used to label columnar API responses
+MY_REQUEST_COLUMNS = ("request_id", "leave_type", "description", "days_requested", "paid_leave", "status")
+ALL_REQUEST_COLUMNS = ("request_id", "emp_id", "leave_type", "description", "days_requested", "paid_leave", "status")
+STAFF_COLUMNS = ("emp_id", "name", "leave_available", "role")
+
+# Fields that update_employee is allowed to touch
+UPDATABLE_FIELDS = ("name", "password", "salt", "leave_available", "role")
+
+
+class Repository(ABC):
+    """Storage interface used by IFSservices; every backend implements these methods."""
+
+    @abstractmethod
+    def create_schema(self) -> None:
+        ...
+
+    # rows are (emp_id, name, password_hash, salt, leave_available, role)
+    @abstractmethod
+    def seed_employees(self, rows: Iterable[Tuple]) -> None:
+        ...
+
+    # returns (name, password_hash, salt, role)
+    @abstractmethod
+    def get_credentials(self, emp_id: str) -> Optional[Tuple[str, str, str, str]]:
+        ...
+
+    @abstractmethod
+    def get_leave_balance(self, emp_id: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def insert_leave_request(self, emp_id: str, leave_type: str, description: str, days: int, paid_leave: int) -> bool:
+        ...
+
+    # returns (request_id, leave_type, description, days_requested, paid_leave, status)
+    @abstractmethod
+    def leave_requests_for(self, emp_id: str) -> List[Tuple]:
+        ...
+
+    # returns (request_id, emp_id, leave_type, description, days_requested, paid_leave, status), newest first
+    @abstractmethod
+    def all_leave_requests(self) -> List[Tuple]:
+        ...
+
+    @abstractmethod
+    def approve_leave_request(self, request_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def deny_leave_request(self, request_id: int) -> bool:
+        ...
+
+    # returns (emp_id, name, leave_available, role)
+    @abstractmethod
+    def staff_summary(self) -> List[Tuple]:
+        ...
+
+    @abstractmethod
+    def employee_exists(self, emp_id: str) -> bool:
+        ...
+
+    # returns False if the emp_id is already taken
+    @abstractmethod
+    def insert_employee(self, emp_id: str, name: str, password: str, salt: str, leave: int, role: str) -> bool:
+        ...
+
+    @abstractmethod
+    def get_employee(self, emp_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def list_employees(self) -> List[Dict[str, Any]]:
+        ...
+
+    # returns False if the employee does not exist
+    @abstractmethod
+    def update_employee(self, emp_id: str, fields: Dict[str, Any]) -> bool:
+        ...
+
+    @abstractmethod
+    def delete_employee(self, emp_id: str) -> bool:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class SQLRepository(Repository):
+    """Shared SQL for the DB-API backends. Queries are written with `?` and
+    rewritten to the driver's placeholder style, subclasses provide the
+    connection handling and the DDL."""
+
+    param = "?"
+    schema: Tuple[str, ...] = ()
+    backend_name = "sql"
+
+    @abstractmethod
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        ...
+
+    def _sql(self, query: str) -> str:
+        return query if self.param == "?" else query.replace("?", self.param)
+
+    def _execute(self, conn, query: str, params: Tuple = ()):
+        cur = conn.cursor()
+        cur.execute(self._sql(query), params)
+        DB_QUERIES.inc(self.backend_name)
+        return cur
+
+    def _fetchone(self, query: str, params: Tuple = ()) -> Optional[Tuple]:
+        with self.connection() as conn:
+            return self._execute(conn, query, params).fetchone()
+
+    def _fetchall(self, query: str, params: Tuple = ()) -> List[Tuple]:
+        with self.connection() as conn:
+            return [tuple(r) for r in self._execute(conn, query, params).fetchall()]
+
+    def _write(self, query: str, params: Tuple = ()) -> int:
+        with self.connection() as conn:
+            return self._execute(conn, query, params).rowcount
+
+    def create_schema(self) -> None:
+        with self.connection() as conn:
+            for ddl in self.schema:
+                self._execute(conn, ddl)
+
+    def seed_employees(self, rows: Iterable[Tuple]) -> None:
+        with self.connection() as conn:
+            for row in rows:
+                self._execute(
+                    conn,
+                    """
+                    INSERT INTO employees (emp_id, name, password, salt, leave_available, role)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (emp_id) DO UPDATE SET
+                        name = excluded.name, password = excluded.password, salt = excluded.salt,
+                        leave_available = excluded.leave_available, role = excluded.role
+                    """,
+                    tuple(row),
+                )
+
+    def get_credentials(self, emp_id: str) -> Optional[Tuple[str, str, str, str]]:
+        row = self._fetchone("SELECT name, password, salt, role FROM employees WHERE emp_id = ?", (emp_id,))
+        return tuple(row) if row else None
+
+    def get_leave_balance(self, emp_id: str) -> Optional[int]:
+        row = self._fetchone("SELECT leave_available FROM employees WHERE emp_id = ?", (emp_id,))
+        return row[0] if row else None
+
+    def insert_leave_request(self, emp_id: str, leave_type: str, description: str, days: int, paid_leave: int) -> bool:
+        return self._write(
+            """
+            INSERT INTO leave_requests (emp_id, leave_type, description, days_requested, paid_leave, status)
+            VALUES (?, ?, ?, ?, ?, 'Pending')
+            """,
+            (emp_id, leave_type, description, days, paid_leave),
+        ) > 0
+
+    def leave_requests_for(self, emp_id: str) -> List[Tuple]:
+        return self._fetchall(
+            """
+            SELECT request_id, leave_type, description, days_requested, paid_leave, status
+            FROM leave_requests WHERE emp_id = ?
+            """,
+            (emp_id,),
+        )
+
+    def all_leave_requests(self) -> List[Tuple]:
+        return self._fetchall(
+            """
+            SELECT request_id, emp_id, leave_type, description, days_requested, paid_leave, status
+            FROM leave_requests
+            ORDER BY request_id DESC
+            """
+        )
+
+    # Both updates are conditional so two workers approving the same request
+    # (or two requests for the same employee) can't double-spend the balance
+    def approve_leave_request(self, request_id: int) -> bool:
+        with self.connection() as conn:
+            row = self._execute(
+                conn, "SELECT emp_id, days_requested FROM leave_requests WHERE request_id = ?", (request_id,)
+            ).fetchone()
+            if not row:
+                return False
+
+            emp_id, days_requested = row
+            claimed = self._execute(
+                conn,
+                "UPDATE leave_requests SET status = 'Approved' WHERE request_id = ? AND status != 'Approved'",
+                (request_id,),
+            ).rowcount
+            if not claimed:
+                return False
+
+            deducted = self._execute(
+                conn,
+                """
+                UPDATE employees SET leave_available = leave_available - ?
+                WHERE emp_id = ? AND leave_available >= ?
+                """,
+                (days_requested, emp_id, days_requested),
+            ).rowcount
+            if not deducted:
+                conn.rollback()  # insufficient balance
+                return False
+            return True
+
+    def deny_leave_request(self, request_id: int) -> bool:
+        return self._write("UPDATE leave_requests SET status = 'Denied' WHERE request_id = ?", (request_id,)) > 0
+
+    def staff_summary(self) -> List[Tuple]:
+        return self._fetchall("SELECT emp_id, name, leave_available, role FROM employees")
+
+    def employee_exists(self, emp_id: str) -> bool:
+        return self._fetchone("SELECT 1 FROM employees WHERE emp_id = ?", (emp_id,)) is not None
+
+    def insert_employee(self, emp_id: str, name: str, password: str, salt: str, leave: int, role: str) -> bool:
+        return self._write(
+            """
+            INSERT INTO employees (emp_id, name, password, salt, leave_available, role)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (emp_id) DO NOTHING
+            """,
+            (emp_id, name, password, salt, int(leave), role),
+        ) > 0
+
+    def get_employee(self, emp_id: str) -> Optional[Dict[str, Any]]:
+        row = self._fetchone(f"SELECT {', '.join(EMPLOYEE_COLUMNS)} FROM employees WHERE emp_id = ?", (emp_id,))
+        return dict(zip(EMPLOYEE_COLUMNS, row)) if row else None
+
+    def list_employees(self) -> List[Dict[str, Any]]:
+        rows = self._fetchall(f"SELECT {', '.join(EMPLOYEE_COLUMNS)} FROM employees ORDER BY emp_id")
+        return [dict(zip(EMPLOYEE_COLUMNS, r)) for r in rows]
+
+    def update_employee(self, emp_id: str, fields: Dict[str, Any]) -> bool:
+        unknown = set(fields) - set(UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return self.employee_exists(emp_id)
+
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        values = tuple(fields.values()) + (emp_id,)
+        return self._write(f"UPDATE employees SET {assignments} WHERE emp_id = ?", values) > 0
+
+    def delete_employee(self, emp_id: str) -> bool:
+        return self._write("DELETE FROM employees WHERE emp_id = ?", (emp_id,)) > 0
+
+
+class SQLiteRepository(SQLRepository):
+    backend_name = "sqlite"
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            emp_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            password TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            leave_available INTEGER NOT NULL DEFAULT 0,
+            role TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS leave_requests (
+            request_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            emp_id TEXT NOT NULL,
+            leave_type TEXT NOT NULL,
+            description TEXT,
+            days_requested INTEGER NOT NULL,
+            paid_leave INTEGER NOT NULL,
+            status TEXT DEFAULT 'Pending',
+            FOREIGN KEY (emp_id) REFERENCES employees(emp_id)
+        )
+        """,
+    )
+
+    # pool_size is how many idle connections are kept open for reuse; 0 opens a
+    # new connection per call. A connection is only ever used by one thread at a time.
+    def __init__(self, path: str, pool_size: int = 0):
+        self.path = str(path)
+        self.pool_size = pool_size
+        self._idle: List[Tuple[sqlite3.Connection, float]] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def create_schema(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        super().create_schema()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        start = time.perf_counter()
+        conn = None
+        with self._lock:
+            if self._idle:
+                conn = self._idle.pop()[0]
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        DB_CONNECTION_WAIT.observe(time.perf_counter() - start, self.backend_name)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            with self._lock:
+                if not self._closed and len(self._idle) < self.pool_size:
+                    self._idle.append((conn, time.monotonic()))
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    # Close pooled connections that have not been used for max_idle seconds
+    def close_idle(self, max_idle: float) -> None:
+        cutoff = time.monotonic() - max_idle
+        with self._lock:
+            stale = [c for c, used in self._idle if used < cutoff]
+            self._idle = [(c, used) for c, used in self._idle if used >= cutoff]
+        for conn in stale:
+            conn.close()
+
+    # Connections checked out right now are closed when they are returned
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+class PostgresRepository(SQLRepository):
+    """Client-server backend with a pool of connections shared by the worker's threads.
+    Needs psycopg2 (pip install psycopg2-binary)."""
+
+    param = "%s"
+    backend_name = "postgres"
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            emp_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            password TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            leave_available INTEGER NOT NULL DEFAULT 0,
+            role TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS leave_requests (
+            request_id SERIAL PRIMARY KEY,
+            emp_id TEXT NOT NULL,
+            leave_type TEXT NOT NULL,
+            description TEXT,
+            days_requested INTEGER NOT NULL,
+            paid_leave INTEGER NOT NULL,
+            status TEXT DEFAULT 'Pending'
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS leave_requests_emp_id ON leave_requests (emp_id)",
+    )
+
+    # ThreadedConnectionPool raises PoolError instead of waiting when every
+    # connection is checked out, so callers queue on a semaphore of the same size
+    def __init__(self, dsn: str, min_connections: int = 1, max_connections: int = 10, timeout: float = 30.0):
+        try:
+            from psycopg2.pool import ThreadedConnectionPool
+        except ImportError as e:
+            raise RuntimeError("The postgres backend needs psycopg2: pip install psycopg2-binary") from e
+
+        self.dsn = dsn
+        self.timeout = timeout
+        self.pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No postgres connection free after {self.timeout}s")
+        try:
+            conn = self.pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        DB_CONNECTION_WAIT.observe(time.perf_counter() - start, self.backend_name)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+            self._slots.release()
+
+    def close(self) -> None:
+        self.pool.closeall()
+
+
+class MemoryRepository(Repository):
+    """In-process stand-in with the same behaviour as the SQL backends, handy for
+    trying the API or the services without a database file or server."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._employees: Dict[str, Dict[str, Any]] = {}
+        self._requests: Dict[int, Dict[str, Any]] = {}
+        self._ids = count(1)
+
+    def create_schema(self) -> None:
+        pass
+
+    def seed_employees(self, rows: Iterable[Tuple]) -> None:
+        with self._lock:
+            for row in rows:
+                emp = dict(zip(EMPLOYEE_COLUMNS, row))
+                self._employees[emp["emp_id"]] = emp
+
+    def get_credentials(self, emp_id: str) -> Optional[Tuple[str, str, str, str]]:
+        emp = self._employees.get(emp_id)
+        return (emp["name"], emp["password"], emp["salt"], emp["role"]) if emp else None
+
+    def get_leave_balance(self, emp_id: str) -> Optional[int]:
+        emp = self._employees.get(emp_id)
+        return emp["leave_available"] if emp else None
+
+    def insert_leave_request(self, emp_id: str, leave_type: str, description: str, days: int, paid_leave: int) -> bool:
+        with self._lock:
+            request_id = next(self._ids)
+            self._requests[request_id] = {
+                "request_id": request_id,
+                "emp_id": emp_id,
+                "leave_type": leave_type,
+                "description": description,
+                "days_requested": days,
+                "paid_leave": paid_leave,
+                "status": "Pending",
+            }
+        return True
+
+    def leave_requests_for(self, emp_id: str) -> List[Tuple]:
+        return [
+            (r["request_id"], r["leave_type"], r["description"], r["days_requested"], r["paid_leave"], r["status"])
+            for r in list(self._requests.values())
+            if r["emp_id"] == emp_id
+        ]
+
+    def all_leave_requests(self) -> List[Tuple]:
+        return [
+            (r["request_id"], r["emp_id"], r["leave_type"], r["description"], r["days_requested"], r["paid_leave"], r["status"])
+            for r in sorted(list(self._requests.values()), key=lambda r: r["request_id"], reverse=True)
+        ]
+
+    def approve_leave_request(self, request_id: int) -> bool:
+        with self._lock:
+            req = self._requests.get(request_id)
+            if not req or req["status"] == "Approved":
+                return False
+            emp = self._employees.get(req["emp_id"])
+            if not emp or emp["leave_available"] < req["days_requested"]:
+                return False
+            emp["leave_available"] -= req["days_requested"]
+            req["status"] = "Approved"
+            return True
+
+    def deny_leave_request(self, request_id: int) -> bool:
+        with self._lock:
+            req = self._requests.get(request_id)
+            if not req:
+                return False
+            req["status"] = "Denied"
+            return True
+
+    def staff_summary(self) -> List[Tuple]:
+        return [(e["emp_id"], e["name"], e["leave_available"], e["role"]) for e in list(self._employees.values())]
+
+    def employee_exists(self, emp_id: str) -> bool:
+        return emp_id in self._employees
+
+    def insert_employee(self, emp_id: str, name: str, password: str, salt: str, leave: int, role: str) -> bool:
+        with self._lock:
+            if emp_id in self._employees:
+                return False
+            self._employees[emp_id] = dict(zip(EMPLOYEE_COLUMNS, (emp_id, name, password, salt, int(leave), role)))
+            return True
+
+    def get_employee(self, emp_id: str) -> Optional[Dict[str, Any]]:
+        emp = self._employees.get(emp_id)
+        return dict(emp) if emp else None
+
+    def list_employees(self) -> List[Dict[str, Any]]:
+        return [dict(self._employees[k]) for k in sorted(self._employees)]
+
+    def update_employee(self, emp_id: str, fields: Dict[str, Any]) -> bool:
+        unknown = set(fields) - set(UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update fields: {', '.join(sorted(unknown))}")
+        with self._lock:
+            emp = self._employees.get(emp_id)
+            if not emp:
+                return False
+            emp.update(fields)
+            return True
+
+    def delete_employee(self, emp_id: str) -> bool:
+        with self._lock:
+            return self._employees.pop(emp_id, None) is not None
@@ -0,0 +1,102 @@
+"""Per-tenant SQLite databases for hosting several companies in one process.
+
+Each tenant gets its own file, TENANT_DIR/<tenant>.db. Open tenants are kept
+in an LRU: at most MAX_OPEN_TENANTS repositories, each pooling up to
+TENANT_POOL_SIZE idle connections, so memory and file handles stay bounded
+however many tenants there are. Connections idle for longer than
+TENANT_IDLE_SECONDS are closed, and a tenant's schema is created the first
+time the process opens it.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Set
+
+from .IFSstorage import SQLiteRepository
+
+TENANT_DIR = os.environ.get("IFS_TENANT_DIR", "")
+# Refuse requests that name no tenant instead of serving them from the default database
+TENANT_REQUIRED = os.environ.get("IFS_TENANT_REQUIRED", "1" if TENANT_DIR else "0") == "1"
+# Tenants that may be created on first use; other names must already have a database file
+TENANTS = {t.strip() for t in os.environ.get("IFS_TENANTS", "").split(",") if t.strip()}
+MAX_OPEN_TENANTS = int(os.environ.get("IFS_MAX_OPEN_TENANTS", "64"))
+TENANT_POOL_SIZE = int(os.environ.get("IFS_TENANT_POOL_SIZE", "2"))
+TENANT_IDLE_SECONDS = float(os.environ.get("IFS_TENANT_IDLE_SECONDS", "300"))
+
+# Tenant names end up in file names, so keep them to a safe alphabet
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+
+class UnknownTenant(LookupError):
+    pass
+
+
+class TenantRegistry:
+    def __init__(self, directory: str, migrate: Callable[[SQLiteRepository], None],
+                 allowed: Optional[Set[str]] = None, max_open: int = MAX_OPEN_TENANTS,
+                 pool_size: int = TENANT_POOL_SIZE, idle_seconds: float = TENANT_IDLE_SECONDS):
+        self.directory = directory
+        self.migrate = migrate
+        self.allowed = set(allowed or ())
+        self.max_open = max_open
+        self.pool_size = pool_size
+        self.idle_seconds = idle_seconds
+        self._open: "OrderedDict[str, SQLiteRepository]" = OrderedDict()
+        self._migrated: Set[str] = set()
+        self._lock = threading.Lock()
+        self._migrate_lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def path_for(self, tenant: str) -> str:
+        return os.path.join(self.directory, f"{tenant}.db")
+
+    def exists(self, tenant: str) -> bool:
+        if not TENANT_NAME.match(tenant):
+            return False
+        return tenant in self.allowed or tenant in self._open or os.path.exists(self.path_for(tenant))
+
+    def get(self, tenant: str) -> SQLiteRepository:
+        if not self.exists(tenant):
+            raise UnknownTenant(tenant)
+
+        evicted = []
+        with self._lock:
+            repo = self._open.get(tenant)
+            if repo is not None:
+                self._open.move_to_end(tenant)
+            else:
+                repo = self._open[tenant] = SQLiteRepository(self.path_for(tenant), pool_size=self.pool_size)
+                while len(self._open) > self.max_open:
+                    evicted.append(self._open.popitem(last=False)[1])
+
+        for old in evicted:
+            old.close()
+        if tenant not in self._migrated:
+            with self._migrate_lock:
+                if tenant not in self._migrated:
+                    self.migrate(repo)
+                    self._migrated.add(tenant)
+        self._sweep()
+        return repo
+
+    # Close connections of tenants nobody has used for a while, at most every few seconds
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < min(self.idle_seconds, 5.0):
+            return
+        self._last_sweep = now
+        with self._lock:
+            repos = list(self._open.values())
+        for repo in repos:
+            repo.close_idle(self.idle_seconds)
+
+    def open_tenants(self) -> int:
+        return len(self._open)
+
+    def close(self) -> None:
+        with self._lock:
+            repos, self._open = list(self._open.values()), OrderedDict()
+        for repo in repos:
+            repo.close()
@@ -0,0 +1,115 @@
+"""Benchmark runner.
+
+    python -m IFS140bench --dataset small --out results.json
+    python -m IFS140bench --dataset medium --compare results-v1.json
+
+Seeds a synthetic SQLite database, runs the service micro-benchmarks, the
+concurrent API load test and the import-time check, and writes the numbers as JSON so two releases can
+be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from IFS140backend import IFSdb
+from IFS140backend.IFSstorage import SQLiteRepository
+from .data import DATASETS, seed_database
+from .load import run_load
+from .micro import run_micro
+from .startup import run_startup
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print the p95 and throughput change for every benchmark present in both files."""
+    print(f"{'benchmark':45} {'p95 ms':>21} {'ops/s':>23}")
+    for section in ("micro", "load"):
+        for name, stats in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if not old or not old.get("calls") or not stats.get("calls"):
+                continue
+            p95_change = (stats["p95_ms"] / old["p95_ms"] - 1) * 100 if old["p95_ms"] else 0.0
+            ops_change = (stats["ops_per_sec"] / old["ops_per_sec"] - 1) * 100 if old["ops_per_sec"] else 0.0
+            print(f"{section + '.' + name:45} {stats['p95_ms']:10.2f} ({p95_change:+6.1f}%)"
+                  f" {stats['ops_per_sec']:12.1f} ({ops_change:+6.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ClockedIn benchmark suite")
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="small")
+    parser.add_argument("--employees", type=int, help="override the dataset's employee count")
+    parser.add_argument("--requests", type=int, help="override the dataset's leave request count")
+    parser.add_argument("--db", help="database file to seed (default: a temporary file)")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per micro-benchmark")
+    parser.add_argument("--load-requests", type=int, default=2000, help="total API requests in the load test")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--skip-startup", action="store_true")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    employees, requests = DATASETS[args.dataset]
+    employees = args.employees or employees
+    requests = args.requests if args.requests is not None else requests
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="ifsbench-"), "bench.db")
+
+    print(f"Seeding {employees} employees / {requests} leave requests into {db_path}", file=sys.stderr)
+    start = time.perf_counter()
+    seed_database(db_path, employees, requests)
+    seed_seconds = time.perf_counter() - start
+    IFSdb.set_repository(SQLiteRepository(db_path))
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "dataset": args.dataset,
+            "employees": employees,
+            "requests": requests,
+            "seed_seconds": seed_seconds,
+        },
+    }
+
+    # the load test runs on a fresh copy so the micro-benchmark writes don't skew it
+    if not args.skip_micro:
+        print("Running service micro-benchmarks", file=sys.stderr)
+        results["micro"] = run_micro(employees, requests, args.iterations)
+        if not args.skip_load:
+            seed_database(db_path, employees, requests)
+
+    if not args.skip_load:
+        print(f"Running API load test ({args.load_requests} requests, {args.concurrency} clients)", file=sys.stderr)
+        results["load"] = run_load(employees, requests, args.load_requests, args.concurrency)
+
+    if not args.skip_startup:
+        print("Measuring import time of the entry points", file=sys.stderr)
+        results["startup"] = run_startup()
+
+    with open(args.out, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"Results written to {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(results, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
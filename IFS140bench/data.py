@@ -0,0 +1,71 @@
+"""Synthetic SQLite databases for the benchmarks.
+
+Every synthetic employee shares one password ("bench") so seeding 10k+
+employees costs a single PBKDF2 run instead of one per row.
+"""
+import random
+import sqlite3
+from pathlib import Path
+from typing import Dict
+
+from IFS140backend.IFSsecurity import hash_password
+from IFS140backend.IFSstorage import SQLiteRepository
+
+BENCH_PASSWORD = "bench"
+
+# name -> (employees, leave requests)
+DATASETS: Dict[str, tuple] = {
+    "small": (10_000, 1_000),
+    "medium": (10_000, 100_000),
+    "large": (20_000, 1_000_000),
+}
+
+LEAVE_TYPES = ("Annual", "Sick", "Family", "Study", "Unpaid")
+STATUSES = ("Pending", "Pending", "Pending", "Approved", "Denied")
+
+
+def employee_id(n: int) -> str:
+    return f"EMP{n:06d}"
+
+
+def seed_database(path: str, employees: int, requests: int, seed: int = 140) -> str:
+    """Create (or replace) a database at `path` with the given number of rows."""
+    db = Path(path)
+    if db.exists():
+        db.unlink()
+
+    repo = SQLiteRepository(str(db))
+    repo.create_schema()
+    hashed, salt = hash_password(BENCH_PASSWORD)
+    rng = random.Random(seed)
+
+    conn = sqlite3.connect(str(db))
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO employees (emp_id, name, password, salt, leave_available, role) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (employee_id(i), f"Employee {i}", hashed, salt, 1_000_000, "Manager" if i % 50 == 0 else "Staff")
+                    for i in range(employees)
+                ),
+            )
+            conn.executemany(
+                """
+                INSERT INTO leave_requests (emp_id, leave_type, description, days_requested, paid_leave, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (
+                        employee_id(rng.randrange(employees)),
+                        rng.choice(LEAVE_TYPES),
+                        "synthetic request",
+                        rng.randint(1, 10),
+                        rng.randint(0, 1),
+                        rng.choice(STATUSES),
+                    )
+                    for _ in range(requests)
+                ),
+            )
+    finally:
+        conn.close()
+    return str(db)
@@ -0,0 +1,79 @@
+"""Concurrent mixed workload driven through the FastAPI app with an in-process ASGI client."""
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from .data import BENCH_PASSWORD, employee_id
+from .micro import summarize
+
+# operation -> share of the traffic
+DEFAULT_MIX = {"login": 0.1, "submit": 0.4, "view_all": 0.1, "approve": 0.2, "view_own": 0.2}
+
+
+async def _request(client, op: str, employees: int, requests: int, rng: random.Random, results: Dict[str, list]):
+    emp = employee_id(rng.randrange(employees))
+    start = time.perf_counter()
+    if op == "login":
+        res = await client.post("/login", json={"emp_id": emp, "password": BENCH_PASSWORD})
+    elif op == "submit":
+        res = await client.post("/leave/submit", json={
+            "emp_id": emp, "leave_type": "Annual", "description": "load test", "days": 1, "paid_leave": 1,
+        })
+    elif op == "view_all":
+        res = await client.get("/leave/view_all")
+    elif op == "approve":
+        res = await client.post(f"/leave/approve/{rng.randint(1, max(1, requests))}")
+    else:
+        res = await client.get(f"/leave/view/{emp}")
+    elapsed = time.perf_counter() - start
+    results[op].append(elapsed)
+    if res.status_code >= 500:
+        results["errors"].append(elapsed)
+    elif res.status_code == 429:
+        results["rate_limited"].append(elapsed)
+
+
+async def _worker(httpx, app, client_id: int, ops: List[str], employees: int, requests: int,
+                  rng: random.Random, results: Dict[str, list]):
+    # every simulated client gets its own address, like real users behind the login rate limiter
+    transport = httpx.ASGITransport(app=app, client=(f"10.0.{client_id // 256}.{client_id % 256}", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for op in ops:
+            await _request(client, op, employees, requests, rng, results)
+
+
+async def _run(app, employees: int, requests: int, total: int, concurrency: int, mix: Dict[str, float], seed: int):
+    try:
+        import httpx
+    except ImportError as e:
+        raise RuntimeError("The load benchmark needs httpx: pip install httpx") from e
+
+    rng = random.Random(seed)
+    ops = rng.choices(list(mix), weights=list(mix.values()), k=total)
+    results: Dict[str, list] = {op: [] for op in mix}
+    results["errors"] = []
+    results["rate_limited"] = []
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(httpx, app, i, ops[i::concurrency], employees, requests, random.Random(seed + i), results)
+        for i in range(concurrency)
+    ))
+    wall = time.perf_counter() - start
+
+    report = {op: summarize(results[op], wall) for op in mix}
+    report["overall"] = summarize([t for op in mix for t in results[op]], wall)
+    report["overall"]["errors"] = len(results["errors"])
+    report["overall"]["rate_limited"] = len(results["rate_limited"])
+    report["overall"]["concurrency"] = concurrency
+    return report
+
+
+def run_load(employees: int, requests: int, total: int = 2000, concurrency: int = 32,
+             mix: Dict[str, float] = None, seed: int = 140) -> Dict[str, Dict[str, float]]:
+    """Run `total` requests split over `concurrency` clients against the configured repository.
+    The app's startup event is not run, the database must already be seeded."""
+    from IFS140api.main import app
+
+    return asyncio.run(_run(app, employees, requests, total, concurrency, mix or DEFAULT_MIX, seed))
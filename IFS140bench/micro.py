@@ -0,0 +1,68 @@
+"""In-process micro-benchmarks of every IFSservices function."""
+import random
+import time
+from typing import Callable, Dict, List
+
+from IFS140backend import IFSservices as services
+from .data import BENCH_PASSWORD, employee_id
+
+
+def summarize(latencies: List[float], wall_time: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (milliseconds) for a list of call durations in seconds."""
+    if not latencies:
+        return {"calls": 0}
+    ordered = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {
+        "calls": len(ordered),
+        "ops_per_sec": len(ordered) / wall_time if wall_time else 0.0,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def measure(func: Callable[[], object], iterations: int) -> Dict[str, float]:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def run_micro(employees: int, requests: int, iterations: int = 200, seed: int = 140) -> Dict[str, Dict[str, float]]:
+    """Benchmark the service layer against the currently configured repository.
+    Listing and KDF-bound functions get fewer iterations so the large datasets finish."""
+    rng = random.Random(seed)
+    emp = lambda: employee_id(rng.randrange(employees))
+    req = lambda: rng.randint(1, max(1, requests))
+    slow = max(1, iterations // 20)
+    new_ids = iter(range(10**9))
+
+    def add_then_remove():
+        new_id = f"BENCH{next(new_ids)}"
+        services.add_employee(new_id, "Bench", BENCH_PASSWORD, 10, "Staff")
+        services.remove_employee(new_id)
+
+    cases = {
+        "authenticate_user": (lambda: services.authenticate_user(emp(), BENCH_PASSWORD), slow),
+        "get_leave_balance": (lambda: services.get_leave_balance(emp()), iterations),
+        "submit_leave_request": (lambda: services.submit_leave_request(emp(), "Annual", "bench", 1, 1), iterations),
+        "view_leave_requests": (lambda: services.view_leave_requests(emp()), iterations),
+        "view_all_leave_requests": (services.view_all_leave_requests, slow),
+        "approve_leave_request": (lambda: services.approve_leave_request(req()), iterations),
+        "deny_leave_request": (lambda: services.deny_leave_request(req()), iterations),
+        "view_all_staff": (services.view_all_staff, slow),
+        "get_employee": (lambda: services.get_employee(emp()), iterations),
+        "list_employees": (services.list_employees, slow),
+        "update_employee": (lambda: services.update_employee(emp(), {"leave_available": 1_000_000}), iterations),
+        "add_and_remove_employee": (add_then_remove, slow),
+    }
+    return {name: measure(func, n) for name, (func, n) in cases.items()}
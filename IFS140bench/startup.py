@@ -0,0 +1,91 @@
+"""Import-time budget for the two entry points.
+
+    python -m IFS140bench.startup
+    python -m IFS140bench.startup --api-budget-ms 600 --gui-budget-ms 300
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`.
+The slowest modules are listed and the exit status is 1 if a budget is exceeded.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# entry point -> (module, default budget in milliseconds)
+ENTRY_POINTS = {
+    "api": ("IFS140api.main", 800),
+    "gui": ("IFS140gui.IFSapp", 400),
+}
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Returns (module, self microseconds, cumulative microseconds) for every import line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_import(module: str, runs: int = 3) -> Dict[str, object]:
+    """Best of `runs` fresh-interpreter imports of `module`, plus the slowest modules of that run."""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"module": module, "error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        rows = parse_importtime(proc.stderr)
+        total = next((cumulative for name, _, cumulative in rows if name == module), sum(r[1] for r in rows))
+        if best is None or total < best[0]:
+            best = (total, rows)
+
+    total, rows = best
+    slowest = sorted(rows, key=lambda r: r[1], reverse=True)[:10]
+    return {
+        "module": module,
+        "total_ms": total / 1000,
+        "slowest_self_ms": {name: self_us / 1000 for name, self_us, _ in slowest},
+    }
+
+
+def run_startup(budgets: Dict[str, float] = None) -> Dict[str, Dict[str, object]]:
+    results = {}
+    for name, (module, default_budget) in ENTRY_POINTS.items():
+        result = measure_import(module)
+        result["budget_ms"] = (budgets or {}).get(name, default_budget)
+        result["within_budget"] = "total_ms" in result and result["total_ms"] <= result["budget_ms"]
+        results[name] = result
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import time of the API and desktop client")
+    for name, (module, budget) in ENTRY_POINTS.items():
+        parser.add_argument(f"--{name}-budget-ms", type=float, default=budget, help=f"budget for importing {module}")
+    args = parser.parse_args(argv)
+
+    results = run_startup({name: getattr(args, f"{name}_budget_ms") for name in ENTRY_POINTS})
+    ok = True
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name}: {result['module']} failed to import: {result['error']}")
+            ok = False
+            continue
+        status = "ok" if result["within_budget"] else "OVER BUDGET"
+        print(f"{name}: {result['module']} {result['total_ms']:.1f} ms (budget {result['budget_ms']:.0f} ms) {status}")
+        for module, ms in result["slowest_self_ms"].items():
+            print(f"    {ms:8.1f} ms  {module}")
+        ok = ok and result["within_budget"]
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,46 @@
 import customtkinter as ctk
 from tkinter import messagebox, Listbox, END, SINGLE, Scrollbar, RIGHT, Y
-import requests
+import hashlib
+import hmac
+import os
 import random
+import threading
+import queue
+
+try:
+    from .IFScache import ClientCache
+except ImportError:  # run as a script: python IFS140gui/IFSapp.py
+    from IFScache import ClientCache
+
+# `requests` (and urllib3 behind it) is imported on first use instead of at start-up,
+# the login window is up before it's needed and preload_http warms it in the background
 
 API_URL = "http://127.0.0.1:8000"
 
+# How often queued (offline) leave requests are retried
+SYNC_INTERVAL_MS = 15000
+
+# (connect, read) seconds; without them a server that drops packets blocks the
+# UI until the OS gives up, long after the cached screen could have been drawn
+HTTP_TIMEOUT = (3.05, 10)
+
+# PBKDF2 rounds for the password check saved for offline sign-in
+OFFLINE_LOGIN_ROUNDS = 200_000
+
+# True when a request failed before a connection to the server was made, so
+# sending it again can't create a duplicate. A read timeout or a reset after the
+# body went out may mean the server already saved it.
+def never_sent(error):
+    import requests
+    from urllib3.exceptions import NewConnectionError
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+# Told to the user when a leave request may or may not have reached the server
+UNKNOWN_OUTCOME = "The server did not answer in time, it may have been saved. Check View My Requests before submitting it again."
+
 greetings = ["Hello", "Sawubona", "Molo", "Dumela", "Hallo", "Thobela", "Lufuno", "Mhoro", "Avuxeni"]
 
 # GUI CLASS 
@@ -13,51 +49,150 @@ class IFSApp:
         self.root = root
         self.root.title("ClockedIn HR Suite")
         self.root.geometry("600x450")
-        ctk.set_window_scaling(1.5)
-        ctk.set_widget_scaling(1.5)
-        ctk.set_appearance_mode("system")
-        ctk.set_default_color_theme("green")
 
         self.API_URL = API_URL
         self.user_data = {}
+        self.cache = ClientCache()
+        # Background threads never touch Tk directly, they hand callbacks to the UI thread here
+        self.ui_queue = queue.Queue()
+        self.screen = 0
+        self.syncing = False
         self.show_login()
+        self.root.after_idle(self.preload_http)
+        self.root.after(100, self.process_ui_queue)
+        self.root.after(SYNC_INTERVAL_MS, self.sync_outbox)
 
     # WINDOW HELPERS 
+    def preload_http(self):
+        threading.Thread(target=lambda: __import__("requests"), daemon=True).start()
+
+    def process_ui_queue(self):
+        while True:
+            try:
+                callback = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            callback()
+        self.root.after(100, self.process_ui_queue)
+
     def clear_window(self):
+        self.screen += 1
         for widget in self.root.winfo_children():
             widget.destroy()
 
-    def api_post(self, endpoint, data=None):
-        data = data or {}
+    # Raw HTTP helpers, safe to call from background threads (no message boxes)
+    def post_json(self, endpoint, data=None):
+        import requests
+        response = requests.post(f"{self.API_URL}{endpoint}", json=data or {}, timeout=HTTP_TIMEOUT)
         try:
-            url = f"{self.API_URL}{endpoint}"
-            response = requests.post(url, json=data)
-
-            try:
-                json_data = response.json()
-            except ValueError:
-                json_data = {"detail": f"Invalid response: {response.text}"}
-
-            json_data["status_code"] = response.status_code
-            return json_data
+            json_data = response.json()
+        except ValueError:
+            json_data = {"detail": f"Invalid response: {response.text}"}
+        json_data["status_code"] = response.status_code
+        return json_data
+
+    def fetch_json(self, endpoint):
+        import requests
+        res = requests.get(f"{self.API_URL}{endpoint}", timeout=HTTP_TIMEOUT)
+        res.raise_for_status()
+        data = res.json()
+        self.cache.put(endpoint, data)
+        return data
 
+    def api_post(self, endpoint, data=None):
+        import requests
+        try:
+            return self.post_json(endpoint, data)
         except requests.exceptions.RequestException as e:
             messagebox.showerror("Connection Error", f"Could not reach server:\n{e}")
             return {"detail": str(e), "status_code": 0}
 
+    # Falls back to the last cached copy when the server can't be reached
     def api_get(self, endpoint):
+        import requests
         try:
-            res = requests.get(f"{API_URL}{endpoint}")
-            res.raise_for_status()
-            return res.json()
+            return self.fetch_json(endpoint)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            cached = self.cache.get(endpoint)
+            if cached is not None:
+                return cached
+            messagebox.showerror("Connection Error", f"Could not reach server:\n{e}")
+            return None
         except requests.exceptions.RequestException as e:
             messagebox.showerror("Connection Error", f"Could not reach server:\n{e}")
             return None
 
+    # Draw a screen from the cached response straight away, then refetch in the
+    # background and redraw if the data changed and the user is still on that screen
+    def show_cached(self, endpoint, render, refresh=False):
+        cached = None if refresh else self.cache.get(endpoint)
+        if cached is None:
+            render(self.api_get(endpoint) or {})
+            return
+
+        render(cached)
+        screen = self.screen
+        threading.Thread(target=self.revalidate, args=(endpoint, cached, render, screen), daemon=True).start()
+
+    def revalidate(self, endpoint, cached, render, screen):
+        import requests
+        try:
+            fresh = self.fetch_json(endpoint)
+        except requests.exceptions.RequestException:
+            return  # offline, keep showing the cached copy
+        if fresh != cached:
+            self.ui_queue.put(lambda: self.screen == screen and render(fresh))
+
+    # Send leave requests that were saved while offline
+    def sync_outbox(self):
+        if not self.syncing and self.cache.queued():
+            self.syncing = True
+            threading.Thread(target=self.send_outbox, daemon=True).start()
+        self.root.after(SYNC_INTERVAL_MS, self.sync_outbox)
+
+    def send_outbox(self):
+        import requests
+        sent = 0
+        try:
+            for item in self.cache.queued():
+                try:
+                    res = self.post_json(item["endpoint"], item["payload"])
+                except requests.exceptions.RequestException as e:
+                    if not never_sent(e):
+                        # resending could file it twice, let the user check instead
+                        self.cache.mark_conflict(item["id"], UNKNOWN_OUTCOME)
+                        continue
+                    self.cache.mark_retry(item["id"], str(e))
+                    break  # still offline, try again on the next tick
+                status = res.get("status_code", 0)
+                error = str(res.get("detail", f"HTTP {status}"))
+                if res.get("status") == "success":
+                    self.cache.mark_sent(item["id"])
+                    sent += 1
+                elif 400 <= status < 500 and status not in (408, 429):
+                    # the server looked at it and said no; tell the user instead of retrying
+                    self.cache.mark_conflict(item["id"], error)
+                else:
+                    # overloaded, throttled or a proxy error: keep it and try again later
+                    self.cache.mark_retry(item["id"], error)
+                    break
+        finally:
+            self.ui_queue.put(lambda: self.report_sync(sent))
+
+    def report_sync(self, sent):
+        self.syncing = False
+        conflicts = self.cache.take_conflicts()
+        if sent:
+            messagebox.showinfo("Synced", f"{sent} leave request(s) saved offline have been submitted.")
+        if conflicts:
+            lines = [f"{c['payload'].get('leave_type', '')} ({c['payload'].get('days', 0)} days): {c['error']}" for c in conflicts]
+            messagebox.showwarning("Sync Conflict", "These offline leave requests were rejected by the server:\n\n" + "\n".join(lines))
+
     def api_delete(self, endpoint):
+        import requests
         try:
             url = f"{self.API_URL}{endpoint}"
-            response = requests.delete(url)
+            response = requests.delete(url, timeout=HTTP_TIMEOUT)
             try:
                 data = response.json()
             except ValueError:
@@ -112,14 +247,54 @@ class IFSApp:
             messagebox.showwarning("Missing Info", "Please enter both ID and password.")
             return
 
-        res = self.api_post("/login", {"emp_id": emp_id, "password": password})
+        import requests
+        try:
+            res = self.post_json("/login", {"emp_id": emp_id, "password": password})
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if not self.offline_login(emp_id, password):
+                messagebox.showerror("Connection Error", f"Could not reach server:\n{e}")
+            return
+        except requests.exceptions.RequestException as e:
+            messagebox.showerror("Connection Error", f"Could not reach server:\n{e}")
+            return
         if not res or res.get("status") != "success":
             messagebox.showerror("Login Failed", "Invalid ID or password.")
             return
 
         self.user_data = res
-        role = res.get("role")
-        if role in ("Admin", "Manager"):
+        self.cache.put(f"/profile/{emp_id}", res)
+        # the PBKDF2 run for offline sign-in happens off the Tk thread
+        threading.Thread(target=self.save_offline_login, args=(emp_id, password), daemon=True).start()
+        self.show_dashboard()
+
+    def save_offline_login(self, emp_id, password):
+        salt = os.urandom(16).hex()
+        self.cache.put(f"/login/{emp_id}", {"salt": salt, "hash": self.password_check(password, salt)})
+
+    # Sign in with the profile cached at the last online login when the server can't be
+    # reached. The password is checked against a salted hash saved on this machine, and
+    # the screens show cached data; leave requests go to the outbox as usual.
+    def offline_login(self, emp_id, password):
+        saved = self.cache.get(f"/login/{emp_id}")
+        profile = self.cache.get(f"/profile/{emp_id}")
+        if not saved or not profile:
+            return False
+        if not hmac.compare_digest(self.password_check(password, saved["salt"]), saved["hash"]):
+            messagebox.showerror("Login Failed", "Invalid ID or password.")
+            return True
+
+        self.user_data = dict(profile, offline=True)
+        messagebox.showinfo("Offline", "The server can't be reached, showing the data saved on this computer.\n"
+                            "Leave requests you submit will be sent once it is back.")
+        self.show_dashboard()
+        return True
+
+    @staticmethod
+    def password_check(password, salt):
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), OFFLINE_LOGIN_ROUNDS).hex()
+
+    def show_dashboard(self):
+        if self.user_data.get("role") in ("Admin", "Manager"):
             self.show_admin_dashboard()
         else:
             self.show_staff_dashboard()
@@ -179,20 +354,52 @@ class IFSApp:
             "days": int(self.leave_days.get() or 0),
             "paid_leave": 1 if self.leave_paid.get() else 0,
         }
-        res = self.api_post("/leave/submit", data)
+        import requests
+        try:
+            res = self.post_json("/leave/submit", data)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if not never_sent(e):
+                messagebox.showwarning("No Answer", UNKNOWN_OUTCOME)
+                self.show_staff_dashboard()
+                return
+            # keep it in the outbox, sync_outbox sends it once the server is back
+            self.cache.enqueue("/leave/submit", data)
+            messagebox.showinfo("Saved Offline", "The server can't be reached right now.\n"
+                                "Your leave request was saved and will be submitted automatically.")
+            self.show_staff_dashboard()
+            return
+        except requests.exceptions.RequestException as e:
+            messagebox.showerror("Connection Error", f"Could not reach server:\n{e}")
+            return
+
         if res and res.get("status") == "success":
             messagebox.showinfo("Success", "Leave request submitted.")
             self.show_staff_dashboard()
 
     def show_my_requests(self):
         emp_id = self.user_data.get("emp_id")
-        res = self.api_get(f"/leave/view/{emp_id}")
+        self.show_cached(f"/leave/view/{emp_id}", self.render_my_requests)
+
+    def render_my_requests(self, res):
+        emp_id = self.user_data.get("emp_id")
         self.clear_window()
         ctk.CTkLabel(self.root, text="My Leave Requests", font=("Lucida Grande", 18, "bold"), text_color="#27823f").pack(pady=20)
 
         frame = ctk.CTkScrollableFrame(self.root)
         frame.pack(fill="both", expand=True, padx=20, pady=10)
 
+        for item in self.cache.queued():
+            q = item["payload"]
+            if item["endpoint"] != "/leave/submit" or q.get("emp_id") != emp_id:
+                continue
+            ctk.CTkLabel(
+                frame,
+                text=f"(offline) | {q['leave_type']} | {q['days']} days | {'Paid' if q['paid_leave'] else 'Unpaid'} | Waiting to sync\n{q['description'] or ''}",
+                anchor="w",
+                justify="left",
+                text_color="gray",
+            ).pack(fill="x", padx=10, pady=5)
+
         for r in res.get("requests", []):
             req_id, ltype, desc, days, paid, status = r
             ctk.CTkLabel(
@@ -225,8 +432,10 @@ class IFSApp:
         ctk.CTkButton(btn_frame, text="Update Employee", command=self.show_update_employee_form).grid(row=0, column=2, padx=10, pady=10)
         ctk.CTkButton(btn_frame, text="Logout", fg_color="#27823f", command=self.show_login).grid(row=2, column=0, columnspan=3, pady=10)
         
-    def manage_leave_requests(self):
-        res = self.api_get("/leave/view_all")
+    def manage_leave_requests(self, refresh=False):
+        self.show_cached("/leave/view_all", self.render_leave_requests, refresh)
+
+    def render_leave_requests(self, res):
         self.clear_window()
         ctk.CTkLabel(self.root, text="Manage Leave Requests", font=("Lucida Grande", 18, "bold"), text_color="#27823f").pack(pady=20)
 
@@ -251,16 +460,18 @@ class IFSApp:
         res = self.api_post(f"/leave/approve/{request_id}")
         if res and res.get("status") == "success":
             messagebox.showinfo("Success", "Request approved.")
-            self.manage_leave_requests()
+            self.manage_leave_requests(refresh=True)
 
     def deny_request(self, request_id):
         res = self.api_post(f"/leave/deny/{request_id}")
         if res and res.get("status") == "success":
             messagebox.showinfo("Success", "Request denied.")
-            self.manage_leave_requests()
+            self.manage_leave_requests(refresh=True)
 
     def show_all_staff(self):
-        res = self.api_get("/staff/all")
+        self.show_cached("/staff/all", self.render_all_staff)
+
+    def render_all_staff(self, res):
         self.clear_window()
         ctk.CTkLabel(self.root, text="All Staff Members", font=("Lucida Grande", 18, "bold"), text_color="#27823f").pack(pady=20)
 
@@ -370,6 +581,7 @@ class IFSApp:
         ctk.CTkButton(frame, text="Back", command=self.show_admin_dashboard).pack()
     
     def submit_update_employee(self):
+        import requests
         emp_id = self.update_emp_id.get().strip()
         if not emp_id:
             messagebox.showerror("Error", "Employee ID is required.")
@@ -382,7 +594,11 @@ class IFSApp:
             "leave_available": int(self.update_emp_leave.get().strip()) if self.update_emp_leave.get().strip() else None,
         }
 
-        res = requests.put(f"{self.API_URL}/employees/{emp_id}", json=data)
+        try:
+            res = requests.put(f"{self.API_URL}/employees/{emp_id}", json=data, timeout=HTTP_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            messagebox.showerror("Connection Error", f"Could not reach server:\n{e}")
+            return
         try:
             result = res.json()
         except ValueError:
@@ -426,6 +642,12 @@ class IFSApp:
 
 # RUN APP
 if __name__ == "__main__":
+    # Scaling and theme are set before the root window exists, so the first
+    # frame is drawn once at the right size instead of being rescaled
+    ctk.set_window_scaling(1.5)
+    ctk.set_widget_scaling(1.5)
+    ctk.set_appearance_mode("system")
+    ctk.set_default_color_theme("green")
     root = ctk.CTk()
     app = IFSApp(root)
     root.mainloop()
@@ -0,0 +1,98 @@
+"""Local SQLite store for the desktop client.
+
+Keeps the last response of every GET screen so it can be drawn straight away
+(and while the API is down), plus an outbox of leave submissions made while
+offline that are sent once the server is reachable again.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+CACHE_FILE = os.environ.get("IFS_CLIENT_CACHE", os.path.join(Path.home(), ".clockedin", "cache.db"))
+
+
+class ClientCache:
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated REAL NOT NULL
+            )
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                endpoint TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'Queued',
+                error TEXT
+            )
+            """)
+
+    # The client touches the cache from the Tk thread and from background sync
+    # threads, so every call opens its own short-lived connection
+    def _conn(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _run(self, query: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            conn = self._conn()
+            try:
+                with conn:
+                    return conn.execute(query, params).fetchall()
+            finally:
+                conn.close()
+
+    # Cached responses
+    def get(self, key: str) -> Optional[Any]:
+        rows = self._run("SELECT payload FROM responses WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def put(self, key: str, value: Any) -> None:
+        self._run(
+            "INSERT OR REPLACE INTO responses (key, payload, updated) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time()),
+        )
+
+    # Offline write queue
+    def enqueue(self, endpoint: str, payload: Dict[str, Any]) -> None:
+        self._run(
+            "INSERT INTO outbox (endpoint, payload, created) VALUES (?, ?, ?)",
+            (endpoint, json.dumps(payload), time.time()),
+        )
+
+    def queued(self) -> List[Dict[str, Any]]:
+        rows = self._run("SELECT id, endpoint, payload, attempts FROM outbox WHERE status = 'Queued' ORDER BY id")
+        return [{"id": r[0], "endpoint": r[1], "payload": json.loads(r[2]), "attempts": r[3]} for r in rows]
+
+    def mark_sent(self, item_id: int) -> None:
+        self._run("DELETE FROM outbox WHERE id = ?", (item_id,))
+
+    def mark_retry(self, item_id: int, error: str) -> None:
+        self._run("UPDATE outbox SET attempts = attempts + 1, error = ? WHERE id = ?", (error, item_id))
+
+    # The server refused the write (e.g. the employee was removed); kept until the user has been told
+    def mark_conflict(self, item_id: int, error: str) -> None:
+        self._run("UPDATE outbox SET attempts = attempts + 1, status = 'Conflict', error = ? WHERE id = ?", (error, item_id))
+
+    def take_conflicts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            conn = self._conn()
+            try:
+                with conn:
+                    rows = conn.execute("SELECT id, payload, error FROM outbox WHERE status = 'Conflict' ORDER BY id").fetchall()
+                    conn.execute("DELETE FROM outbox WHERE status = 'Conflict'")
+            finally:
+                conn.close()
+        return [{"id": r[0], "payload": json.loads(r[1]), "error": r[2]} for r in rows]
@@ -0,0 +1,88 @@
+"""Content negotiation for the listing endpoints: q-values decide, the server's
+order breaks ties, and q=0 means "not acceptable"."""
+import gzip
+import json
+import types
+
+import pytest
+
+from IFS140api import encoding
+from IFS140api.encoding import COLUMNAR_JSON, MSGPACK, _negotiate, _qvalues, listing_response
+
+MEDIA = [(MSGPACK, ()), (COLUMNAR_JSON, ()), ("application/json", ("application/*", "*/*"))]
+CODINGS = [("br", ("*",)), ("gzip", ("*",)), ("identity", ())]
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", {}),
+    ("application/json", {"application/json": 1.0}),
+    ("Application/JSON ; q=0.5, */*;q=0.1", {"application/json": 0.5, "*/*": 0.1}),
+    ("gzip;q=2, br;q=-1", {"gzip": 1.0, "br": 0.0}),
+    ("gzip;q=abc", {"gzip": 0.0}),
+    ("gzip;level=1;q=0.3", {"gzip": 0.3}),
+    ("gzip;q=0.2, gzip;q=0.7", {"gzip": 0.7}),
+    (" , ,br", {"br": 1.0}),
+])
+def test_qvalues(header, expected):
+    assert _qvalues(header) == expected
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/json", "application/json"),
+    ("*/*", "application/json"),
+    ("application/*", "application/json"),
+    (f"{COLUMNAR_JSON}", COLUMNAR_JSON),
+    (f"application/json, {COLUMNAR_JSON}", COLUMNAR_JSON),
+    (f"application/json, {COLUMNAR_JSON};q=0.9", "application/json"),
+    (f"{MSGPACK};q=0.5, {COLUMNAR_JSON};q=0.8", COLUMNAR_JSON),
+    ("application/json;q=0, */*", None),
+    ("text/html", None),
+])
+def test_negotiate_media(accept, expected):
+    assert _negotiate(_qvalues(accept), MEDIA) == expected
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, br", "br"),
+    ("gzip, br;q=0.5", "gzip"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("identity", "identity"),
+    ("br;q=0, gzip;q=0", None),
+    ("", None),
+])
+def test_negotiate_codings(accept_encoding, expected):
+    assert _negotiate(_qvalues(accept_encoding), CODINGS) == expected
+
+
+ROWS = [("EMP%03d" % i, "Name %d" % i, i) for i in range(200)]
+
+
+def listing(headers):
+    request = types.SimpleNamespace(headers=headers)
+    return listing_response(request, "employees", ("emp_id", "name", "leave_available"), ROWS)
+
+
+def test_listing_defaults_to_plain_json():
+    response = listing({"accept": "*/*"})
+    assert response.media_type == "application/json"
+    assert "content-encoding" not in response.headers
+    assert json.loads(response.body)["employees"][1] == ["EMP001", "Name 1", 1]
+
+
+def test_listing_columnar_gzip(monkeypatch):
+    monkeypatch.setattr(encoding, "brotli", None)
+    response = listing({"accept": COLUMNAR_JSON, "accept-encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    body = json.loads(gzip.decompress(response.body))
+    assert body["columns"] == ["emp_id", "name", "leave_available"]
+    assert body["values"][2] == list(range(200))
+
+
+def test_listing_msgpack_brotli():
+    msgpack = pytest.importorskip("msgpack")
+    brotli = pytest.importorskip("brotli")
+    response = listing({"accept": f"{MSGPACK}, application/json;q=0.5", "accept-encoding": "gzip;q=0.5, br"})
+    assert response.media_type == MSGPACK
+    assert response.headers["content-encoding"] == "br"
+    assert msgpack.unpackb(brotli.decompress(response.body))["values"][0][0] == "EMP000"
@@ -0,0 +1,129 @@
+"""Login throttling: the buckets have to hold under concurrency, lockouts grow,
+refusals say when to retry, and known-good users get through an attack."""
+import asyncio
+import types
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from IFS140api import ratelimit
+from IFS140api.main import app
+from IFS140backend.IFSdb import migrate_repository, set_repository
+from IFS140backend.IFSmetrics import KDF_LATENCY
+from IFS140backend.IFSstorage import MemoryRepository
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = ratelimit.MemoryStore() if request.param == "memory" else ratelimit.SQLiteStore(str(tmp_path / "rl.db"))
+    ratelimit.set_store(store)
+    yield store
+    ratelimit.set_store(None)
+
+
+@pytest.fixture
+def api(store, monkeypatch):
+    repo = MemoryRepository()
+    migrate_repository(repo)
+    set_repository(repo)
+    monkeypatch.setattr(ratelimit, "TRUST_FORWARDED", True)
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXIES", 1)
+    yield
+    set_repository(None)
+
+
+def login_all(attempts):
+    """Send (emp_id, password, ip) logins concurrently, returns the status codes."""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.post("/login", json={"emp_id": emp_id, "password": password}, headers={"X-Forwarded-For": ip})
+                for emp_id, password, ip in attempts
+            ))
+        return [r.status_code for r in responses]
+    return asyncio.run(run())
+
+
+def test_concurrent_bad_logins_cannot_outrun_the_buckets(api, monkeypatch):
+    monkeypatch.setattr(ratelimit, "EMP_LIMIT", (10.0, 0.001))
+    before = KDF_LATENCY.count()
+
+    codes = login_all([("MAN01", "wrong", "6.6.6.6")] * 300)
+
+    assert KDF_LATENCY.count() - before <= 10
+    assert codes.count(401) <= 10
+    assert codes.count(429) >= 290
+
+
+def test_trusted_pair_gets_through_an_attack(api):
+    assert login_all([("MAN01", "SuchIsLife", "10.0.0.1")]) == [200]
+
+    attack = login_all([("MAN01", "wrong", f"7.7.7.{i}") for i in range(12)])
+    assert attack.count(429) == 2
+
+    assert login_all([("MAN01", "SuchIsLife", "10.0.0.1")]) == [200]
+    assert login_all([("MAN01", "SuchIsLife", "10.0.0.2")]) == [429]
+
+
+def test_good_logins_behind_one_nat_are_free(store, monkeypatch):
+    monkeypatch.setattr(ratelimit, "LOGIN_TRUST_SECONDS", 0)
+    for _ in range(3 * int(ratelimit.IP_LIMIT[0])):
+        charged = ratelimit.check_login("8.8.8.8", "IKOL03")
+        ratelimit.login_succeeded("8.8.8.8", "IKOL03", charged)
+
+
+def test_lockout_grows_exponentially(store, monkeypatch):
+    monkeypatch.setattr(ratelimit, "LOCKOUT_THRESHOLD", 3)
+    monkeypatch.setattr(ratelimit, "LOCKOUT_BASE", 2.0)
+    monkeypatch.setattr(ratelimit, "LOCKOUT_MAX", 10.0)
+    now = 1000.0
+    lockouts = []
+    for _ in range(7):
+        store.record_failure("lock:x", now)
+        lockouts.append(store.locked_for("lock:x", now))
+
+    assert lockouts == [0, 0, 2.0, 4.0, 8.0, 10.0, 10.0]
+    store.reset("lock:x")
+    assert store.locked_for("lock:x", now) == 0
+
+
+def test_retry_after_for_an_empty_bucket(store, monkeypatch):
+    monkeypatch.setattr(ratelimit, "EMP_LIMIT", (1.0, 0.2))
+    assert ratelimit.check_login("1.2.3.4", "MAN01")
+    ratelimit.login_failed("1.2.3.4", "MAN01")
+
+    with pytest.raises(HTTPException) as refused:
+        ratelimit.check_login("1.2.3.5", "MAN01")
+    assert refused.value.status_code == 429
+    assert refused.value.headers["Retry-After"] == "5"
+
+
+def test_retry_after_for_a_lockout(store, monkeypatch):
+    monkeypatch.setattr(ratelimit, "LOCKOUT_THRESHOLD", 1)
+    monkeypatch.setattr(ratelimit, "LOCKOUT_BASE", 30.0)
+    ratelimit.login_failed("1.2.3.4", "MAN01")
+
+    with pytest.raises(HTTPException) as refused:
+        ratelimit.check_login("1.2.3.4", "MAN01")
+    assert refused.value.headers["Retry-After"] in ("29", "30")
+
+
+def request_from(peer, forwarded=None):
+    headers = {"x-forwarded-for": forwarded} if forwarded else {}
+    return types.SimpleNamespace(headers=headers, client=types.SimpleNamespace(host=peer))
+
+
+@pytest.mark.parametrize("trust, proxies, forwarded, expected", [
+    (False, 1, "1.1.1.1, 5.5.5.5", "9.9.9.9"),
+    (True, 1, None, "9.9.9.9"),
+    (True, 1, "5.5.5.5", "5.5.5.5"),
+    (True, 1, "1.1.1.1, 5.5.5.5", "5.5.5.5"),
+    (True, 2, "1.1.1.1, 5.5.5.5, 6.6.6.6", "5.5.5.5"),
+    (True, 3, "5.5.5.5, 6.6.6.6", "9.9.9.9"),
+])
+def test_client_ip(monkeypatch, trust, proxies, forwarded, expected):
+    monkeypatch.setattr(ratelimit, "TRUST_FORWARDED", trust)
+    monkeypatch.setattr(ratelimit, "TRUSTED_PROXIES", proxies)
+    assert ratelimit.client_ip(request_from("9.9.9.9", forwarded)) == expected
@@ -0,0 +1,299 @@
+"""Behaviour every storage backend has to share, run against SQLite, the
+in-process MemoryRepository and PostgresRepository. A new backend should pass
+this module unchanged.
+
+PostgresRepository runs on a DB-API stand-in with the `format` paramstyle, so
+the placeholder rewrite, commit/rollback and the pool are exercised without a
+server. Set IFS_TEST_PG_DSN to a throwaway database to also run it against a
+real PostgreSQL; its tables are dropped before every test."""
+import os
+import sqlite3
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from IFS140backend.IFSstorage import EMPLOYEE_COLUMNS, MemoryRepository, PostgresRepository, Repository, SQLiteRepository
+
+# (emp_id, name, password_hash, salt, leave_available, role)
+SEED = [
+    ("MAN01", "Patrick", "hash-m", "salt-m", 45, "Manager"),
+    ("EMP02", "Mbasa", "hash-e", "salt-e", 5, "Frontend Dev"),
+]
+
+PG_DSN = os.environ.get("IFS_TEST_PG_DSN", "")
+
+
+class PoolError(Exception):
+    pass
+
+
+class FormatCursor:
+    """Takes `%s` placeholders and the postgres DDL, runs them on SQLite."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        assert "?" not in query, "query was not rewritten to the driver's placeholders"
+        query = query.replace("%s", "?").replace("SERIAL PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+        self._cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class FormatConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return FormatCursor(self._conn.cursor())
+
+    def commit(self):
+        self.commits += 1
+        self._conn.commit()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class FormatPool:
+    """Like psycopg2's ThreadedConnectionPool: the dsn is a SQLite path here, and
+    asking for more than maxconn connections raises instead of waiting."""
+
+    def __init__(self, minconn, maxconn, dsn):
+        self.maxconn = maxconn
+        self.dsn = dsn
+        self.lock = threading.Lock()
+        self.idle = [FormatConnection(dsn) for _ in range(minconn)]
+        self.used = set()
+        self.peak = 0
+
+    def getconn(self):
+        with self.lock:
+            if len(self.used) >= self.maxconn:
+                raise PoolError("connection pool exhausted")
+            conn = self.idle.pop() if self.idle else FormatConnection(self.dsn)
+            self.used.add(conn)
+            self.peak = max(self.peak, len(self.used))
+            return conn
+
+    def putconn(self, conn):
+        with self.lock:
+            self.used.remove(conn)
+            self.idle.append(conn)
+
+    def closeall(self):
+        for conn in self.idle + list(self.used):
+            conn.close()
+
+
+@pytest.fixture
+def format_driver(monkeypatch):
+    pool = types.ModuleType("psycopg2.pool")
+    pool.ThreadedConnectionPool = FormatPool
+    pool.PoolError = PoolError
+    driver = types.ModuleType("psycopg2")
+    driver.paramstyle = "format"
+    driver.pool = pool
+    monkeypatch.setitem(sys.modules, "psycopg2", driver)
+    monkeypatch.setitem(sys.modules, "psycopg2.pool", pool)
+
+
+def postgres_repository(dsn, **kwargs) -> PostgresRepository:
+    repository = PostgresRepository(dsn, **kwargs)
+    with repository.connection() as conn:
+        for table in ("leave_requests", "employees"):
+            conn.cursor().execute(f"DROP TABLE IF EXISTS {table}")
+    return repository
+
+
+@pytest.fixture(params=["sqlite", "memory", "postgres-format", "postgres"])
+def repo(request, tmp_path) -> Repository:
+    if request.param == "sqlite":
+        repository = SQLiteRepository(tmp_path / "contract.db")
+    elif request.param == "memory":
+        repository = MemoryRepository()
+    elif request.param == "postgres-format":
+        request.getfixturevalue("format_driver")
+        repository = postgres_repository(str(tmp_path / "contract.db"))
+    else:
+        if not PG_DSN:
+            pytest.skip("IFS_TEST_PG_DSN is not set")
+        pytest.importorskip("psycopg2")
+        repository = postgres_repository(PG_DSN)
+    repository.create_schema()
+    repository.seed_employees(SEED)
+    yield repository
+    repository.close()
+
+
+def submit(repo: Repository, emp_id: str = "EMP02", days: int = 3) -> int:
+    assert repo.insert_leave_request(emp_id, "Annual", "Holiday", days, 1)
+    return repo.all_leave_requests()[0][0]
+
+
+def status_of(repo: Repository, request_id: int) -> str:
+    return next(r[-1] for r in repo.all_leave_requests() if r[0] == request_id)
+
+
+def test_seeding_twice_updates_existing_employees(repo):
+    repo.seed_employees([("MAN01", "Pat", "hash-2", "salt-2", 40, "Admin")])
+
+    assert repo.get_credentials("MAN01") == ("Pat", "hash-2", "salt-2", "Admin")
+    assert repo.get_leave_balance("MAN01") == 40
+    assert len(repo.list_employees()) == len(SEED)
+
+
+def test_create_schema_is_idempotent(repo):
+    repo.create_schema()
+    assert repo.employee_exists("MAN01")
+
+
+def test_unknown_employee_lookups(repo):
+    assert repo.get_credentials("NOPE") is None
+    assert repo.get_leave_balance("NOPE") is None
+    assert repo.get_employee("NOPE") is None
+    assert not repo.employee_exists("NOPE")
+
+
+def test_insert_employee_rejects_duplicate_id(repo):
+    assert repo.insert_employee("NEW03", "Inga", "h", "s", 14, "Staff")
+    assert not repo.insert_employee("NEW03", "Someone else", "h2", "s2", 1, "Staff")
+
+    assert repo.get_employee("NEW03") == dict(zip(EMPLOYEE_COLUMNS, ("NEW03", "Inga", "h", "s", 14, "Staff")))
+
+
+def test_leave_requests_for_only_returns_that_employee(repo):
+    submit(repo, "EMP02")
+    submit(repo, "MAN01")
+
+    rows = repo.leave_requests_for("EMP02")
+    assert len(rows) == 1
+    assert rows[0][1:] == ("Annual", "Holiday", 3, 1, "Pending")
+
+
+def test_approve_deducts_balance_once(repo):
+    request_id = submit(repo, days=3)
+
+    assert repo.approve_leave_request(request_id)
+    assert not repo.approve_leave_request(request_id)
+    assert repo.get_leave_balance("EMP02") == 2
+    assert status_of(repo, request_id) == "Approved"
+
+
+def test_approve_with_insufficient_balance_leaves_request_pending(repo):
+    request_id = submit(repo, days=6)
+
+    assert not repo.approve_leave_request(request_id)
+    assert status_of(repo, request_id) == "Pending"
+    assert repo.get_leave_balance("EMP02") == 5
+
+
+def test_approve_missing_request(repo):
+    assert not repo.approve_leave_request(999)
+
+
+def test_denied_request_can_still_be_approved(repo):
+    request_id = submit(repo, days=2)
+
+    assert repo.deny_leave_request(request_id)
+    assert status_of(repo, request_id) == "Denied"
+    assert repo.approve_leave_request(request_id)
+    assert status_of(repo, request_id) == "Approved"
+    assert repo.get_leave_balance("EMP02") == 3
+
+
+def test_deny_missing_request(repo):
+    assert not repo.deny_leave_request(999)
+
+
+def test_update_employee(repo):
+    assert repo.update_employee("EMP02", {"name": "Mbasa B", "leave_available": 9})
+    assert repo.get_employee("EMP02")["name"] == "Mbasa B"
+    assert repo.get_leave_balance("EMP02") == 9
+    assert not repo.update_employee("NOPE", {"name": "x"})
+
+
+def test_update_employee_rejects_unknown_fields(repo):
+    with pytest.raises(ValueError):
+        repo.update_employee("EMP02", {"emp_id": "HIJACK"})
+    with pytest.raises(ValueError):
+        repo.update_employee("EMP02", {"name": "ok", "is_admin": True})
+    assert repo.get_employee("EMP02")["name"] == "Mbasa"
+
+
+def test_delete_employee(repo):
+    assert repo.delete_employee("EMP02")
+    assert not repo.delete_employee("EMP02")
+    assert not repo.employee_exists("EMP02")
+    assert [e["emp_id"] for e in repo.list_employees()] == ["MAN01"]
+
+
+def test_all_leave_requests_newest_first(repo):
+    ids = [submit(repo, emp_id) for emp_id in ("EMP02", "MAN01", "EMP02")]
+
+    rows = repo.all_leave_requests()
+    assert [r[0] for r in rows] == sorted(ids, reverse=True)
+    assert [r[1] for r in rows] == ["EMP02", "MAN01", "EMP02"]
+
+
+def test_list_employees_ordered_by_id(repo):
+    repo.insert_employee("AAA00", "First", "h", "s", 1, "Staff")
+    repo.insert_employee("ZZZ99", "Last", "h", "s", 1, "Staff")
+
+    employees = repo.list_employees()
+    assert [e["emp_id"] for e in employees] == ["AAA00", "EMP02", "MAN01", "ZZZ99"]
+    assert all(tuple(e) == EMPLOYEE_COLUMNS for e in employees)
+
+
+def test_staff_summary(repo):
+    assert sorted(repo.staff_summary()) == [("EMP02", "Mbasa", 5, "Frontend Dev"), ("MAN01", "Patrick", 45, "Manager")]
+
+
+def test_postgres_pool_queues_instead_of_failing(format_driver, tmp_path):
+    repository = postgres_repository(str(tmp_path / "pool.db"), max_connections=2)
+    errors = []
+
+    def hold():
+        try:
+            with repository.connection():
+                time.sleep(0.02)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=hold) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert repository.pool.peak == 2
+    assert not repository.pool.used
+
+
+def test_postgres_rolls_back_on_error_and_times_out_when_full(format_driver, tmp_path):
+    repository = postgres_repository(str(tmp_path / "pool.db"), max_connections=1, timeout=0.05)
+    repository.create_schema()
+    repository.seed_employees(SEED)
+
+    with pytest.raises(RuntimeError):
+        with repository.connection() as conn:
+            conn.cursor().execute("UPDATE employees SET leave_available = 0 WHERE emp_id = %s", ("EMP02",))
+            raise RuntimeError("boom")
+    assert conn.rollbacks == 1
+    assert repository.get_leave_balance("EMP02") == 5
+
+    with repository.connection():
+        with pytest.raises(TimeoutError):
+            with repository.connection():
+                pass
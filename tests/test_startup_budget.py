@@ -0,0 +1,20 @@
+"""Importing either entry point has to stay within its budget in
+IFS140bench/startup.py, so a heavy import at module level fails here."""
+import pytest
+
+from IFS140bench.startup import ENTRY_POINTS, run_startup
+
+
+@pytest.fixture(scope="module")
+def startup():
+    return run_startup()
+
+
+@pytest.mark.parametrize("entry_point", sorted(ENTRY_POINTS))
+def test_entry_point_imports_within_budget(startup, entry_point):
+    result = startup[entry_point]
+    assert "error" not in result, f"{result['module']} failed to import: {result.get('error')}"
+    assert result["within_budget"], (
+        f"{result['module']} took {result['total_ms']:.1f} ms (budget {result['budget_ms']:.0f} ms), "
+        f"slowest: {result['slowest_self_ms']}"
+    )